@@ -0,0 +1,226 @@
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from device import DeviceType
+
+if TYPE_CHECKING:
+    from logicSimulator import Netlist
+
+
+def getVariableOrder(netlist: "Netlist") -> List[int]:
+    # input pins in depth-first fan-in order from the outputs, largest
+    # output cone first, so pins feeding the same gates stay close together
+    pinCount = netlist.pinCount
+    offsets, fanins = netlist.faninOffsets, netlist.faninIndices
+    coneSizes = [1] * pinCount
+    for k in range(len(netlist.gateTypes)):
+        coneSizes.append(1 + sum(coneSizes[fanins[i]]
+                                 for i in range(offsets[k], offsets[k + 1])))
+    order: List[int] = []
+    visited = bytearray(pinCount + len(netlist.gateTypes))
+    for output in sorted(netlist.outputs, key=lambda i: -coneSizes[i]):
+        stack = [output]
+        while stack:
+            signal = stack.pop()
+            if visited[signal]:
+                continue
+            visited[signal] = 1
+            if signal < pinCount:
+                order.append(signal)
+                continue
+            k = signal - pinCount
+            # reversed so the first fan-in is visited first
+            stack.extend(fanins[i] for i in range(offsets[k + 1] - 1,
+                                                  offsets[k] - 1, -1))
+    order.extend(i for i in range(pinCount) if not visited[i])
+    return order
+
+
+class BDD:
+    # reduced ordered binary decision diagrams sharing one node table, node 0
+    # and 1 are the constants, every other node is (level, low, high) where
+    # level indexes order and low/high are the nodes for pin value 0/1
+    def __init__(self, order: Sequence[int], maxNodeCount: int = 1 << 22) -> None:
+        # input pins from the root level down
+        self.order = list(order)
+        self.maxNodeCount = maxNodeCount
+        terminalLevel = len(self.order)
+        self.levels: List[int] = [terminalLevel, terminalLevel]
+        self.lows: List[int] = [0, 1]
+        self.highs: List[int] = [0, 1]
+        # (level, low, high) to node, keeps the diagrams reduced and shared
+        self.unique: Dict[Tuple[int, int, int], int] = {}
+        # (operation, f, g) to node, DeviceType values name the operation
+        self.computed: Dict[Tuple[int, int, int], int] = {}
+        self.pinLevels = [0] * len(self.order)
+        for level, pin in enumerate(self.order):
+            self.pinLevels[pin] = level
+
+    def __len__(self) -> int:
+        return len(self.levels)
+
+    def node(self, level: int, low: int, high: int) -> int:
+        if low == high:
+            return low
+        key = (level, low, high)
+        node = self.unique.get(key)
+        if node is None:
+            if len(self.levels) >= self.maxNodeCount:
+                raise MemoryError(f"bdd exceeds {self.maxNodeCount} nodes")
+            node = self.unique[key] = len(self.levels)
+            self.levels.append(level)
+            self.lows.append(low)
+            self.highs.append(high)
+        return node
+
+    def variable(self, pin: int) -> int:
+        return self.node(self.pinLevels[pin], 0, 1)
+
+    def negate(self, f: int) -> int:
+        # explicit stacks rather than recursion, diagrams may be deeper than
+        # the recursion limit; a (node, key) task combines the last result
+        levels, lows, highs = self.levels, self.lows, self.highs
+        computed = self.computed
+        results: List[int] = []
+        stack: List[Tuple[int, ...]] = [(f,)]
+        while stack:
+            task = stack.pop()
+            if len(task) == 2:
+                f, key = task
+                node = computed[key] = self.node(
+                    levels[f], results.pop(), results.pop())
+                results.append(node)
+                continue
+            f = task[0]
+            if f <= 1:
+                results.append(1 - f)
+                continue
+            key = (DeviceType.gateNot.value, f, f)
+            node = computed.get(key)
+            if node is not None:
+                results.append(node)
+                continue
+            # high is negated first, leaving the low result on top
+            stack.extend(((f, key), (lows[f],), (highs[f],)))
+        return results[0]
+
+    def apply(self, operation: int, f: int, g: int) -> int:
+        # operation is DeviceType.gateAND or gateOR value, explicit stacks as
+        # in negate; a (level, key, 0) task combines the last two results
+        absorbing = 0 if operation == DeviceType.gateAND.value else 1
+        levels, lows, highs = self.levels, self.lows, self.highs
+        computed = self.computed
+        results: List[int] = []
+        stack: List[Tuple[int, ...]] = [(f, g)]
+        while stack:
+            task = stack.pop()
+            if len(task) == 3:
+                level, key = task[0], task[1]
+                high = results.pop()
+                node = computed[key] = self.node(level, results.pop(), high)
+                results.append(node)
+                continue
+            f, g = task
+            if f == absorbing or g == absorbing:
+                results.append(absorbing)
+                continue
+            if f == 1 - absorbing or f == g:
+                results.append(g)
+                continue
+            if g == 1 - absorbing:
+                results.append(f)
+                continue
+            if f > g:
+                f, g = g, f
+            key = (operation, f, g)
+            node = computed.get(key)
+            if node is not None:
+                results.append(node)
+                continue
+            level = min(levels[f], levels[g])
+            f0, f1 = (lows[f], highs[f]) if levels[f] == level else (f, f)
+            g0, g1 = (lows[g], highs[g]) if levels[g] == level else (g, g)
+            stack.extend(((level, key, 0), (f1, g1), (f0, g0)))
+        return results[0]
+
+    def addNetlist(self, netlist: "Netlist") -> List[int]:
+        # node of every output, netlist must be in topological order and
+        # have as many pins as order
+        gateAND, gateOR = DeviceType.gateAND.value, DeviceType.gateOR.value
+        offsets, fanins = netlist.faninOffsets, netlist.faninIndices
+        nodes = [self.variable(i) for i in range(netlist.pinCount)]
+        for k, gateType in enumerate(netlist.gateTypes):
+            begin, end = offsets[k], offsets[k + 1]
+            if gateType == gateAND or gateType == gateOR:
+                node = nodes[fanins[begin]]
+                for i in range(begin + 1, end):
+                    node = self.apply(gateType, node, nodes[fanins[i]])
+            else:
+                node = self.negate(nodes[fanins[begin]])
+            nodes.append(node)
+        return [nodes[i] for i in netlist.outputs]
+
+    def getSatisfyingCount(self, f: int) -> int:
+        # input vectors over every pin for which f is 1
+        counts = {0: 0, 1: 1}
+        levels, lows, highs = self.levels, self.lows, self.highs
+        # children first, without recursion
+        stack = [f]
+        while stack:
+            node = stack[-1]
+            if node in counts:
+                stack.pop()
+                continue
+            low, high = lows[node], highs[node]
+            if low not in counts:
+                stack.append(low)
+            elif high not in counts:
+                stack.append(high)
+            else:
+                stack.pop()
+                counts[node] = \
+                    (counts[low] << (levels[low] - levels[node] - 1)) + \
+                    (counts[high] << (levels[high] - levels[node] - 1))
+        return counts[f] << levels[f]
+
+    def getSatisfyingRow(self, f: int) -> Optional[int]:
+        # a truth table row for which f is 1, pins f does not depend on are
+        # 0, None if f is 0
+        if f == 0:
+            return None
+        pinCount = len(self.order)
+        row = 0
+        while f > 1:
+            if self.lows[f] != 0:
+                f = self.lows[f]
+            else:
+                row |= 1 << (pinCount - 1 - self.order[self.levels[f]])
+                f = self.highs[f]
+        return row
+
+    def isEquivalent(self, f: int, g: int) -> bool:
+        # canonical, equal functions share a node
+        return f == g
+
+    def getDifferingRow(self, f: int, g: int) -> Optional[int]:
+        # a truth table row where f and g differ, None if they are equivalent
+        gateAND, gateOR = DeviceType.gateAND.value, DeviceType.gateOR.value
+        return self.getSatisfyingRow(self.apply(
+            gateOR, self.apply(gateAND, f, self.negate(g)),
+            self.apply(gateAND, self.negate(f), g)))
+
+    def getValue(self, f: int, row: int) -> int:
+        # value of f in truth table row, pin 1 is the most significant bit
+        pinCount = len(self.order)
+        while f > 1:
+            pin = self.order[self.levels[f]]
+            f = self.highs[f] if row >> (pinCount - 1 - pin) & 1 \
+                else self.lows[f]
+        return f
+
+    def iterRows(self, outputs: Sequence[int], start: int = 0,
+                 stop: Optional[int] = None) -> Iterator[str]:
+        # truth table rows start to stop, one walk per output and row
+        pinCount = len(self.order)
+        for row in range(start, (1 << pinCount) if stop is None else stop):
+            yield " ".join(format(row, f"0{pinCount}b")) + " | " + \
+                " ".join(str(self.getValue(f, row)) for f in outputs)
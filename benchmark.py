@@ -0,0 +1,332 @@
+from argparse import ArgumentParser
+import json
+from pathlib import Path
+from platform import python_version
+from random import Random
+from re import fullmatch
+import sys
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+from logicSimulator import LogicSimulator, TruthTableMode
+
+
+def notChainLcf(gateCount: int) -> str:
+    # -1 -> NOT -> NOT -> ... -> NOT
+    lines = ["1", str(gateCount), "3 -1 0"]
+    lines += [f"3 {i}.1 0" for i in range(1, gateCount)]
+    return "\n".join(lines)
+
+
+def reconvergentLcf(gateCount: int) -> str:
+    # every gate reads the previous two gates, so each gate fans out twice
+    lines = ["2", str(gateCount), "1 -1 -2 0", "2 -1 1.1 0"][:gateCount + 2]
+    for i in range(3, gateCount + 1):
+        lines.append(f"{1 + i % 2} {i - 1}.1 {i - 2}.1 0")
+    return "\n".join(lines)
+
+
+def randomLcf(pinCount: int, gateCount: int, seed: int = 0) -> str:
+    # random DAG, gate i only reads pins and gates before it
+    rng = Random(seed)
+    lines = [str(pinCount), str(gateCount)]
+    for i in range(1, gateCount + 1):
+        gateType = rng.choice((1, 2, 3))
+        faninCount = 1 if gateType == 3 else rng.randint(2, 3)
+        fanins = []
+        for _ in range(faninCount):
+            device = rng.randrange(-pinCount, i - 1)
+            fanins.append(str(device) if device < 0 else f"{device + 1}.1")
+        lines.append(f"{gateType} {' '.join(fanins)} 0")
+    return "\n".join(lines)
+
+
+class LcfBuilder:
+    # collects gates and numbers them in the order they are added
+    def __init__(self, pinCount: int) -> None:
+        self.pinCount = pinCount
+        self.gates: List[str] = []
+
+    def pin(self, i: int) -> str:
+        return f"-{i + 1}"
+
+    def addGate(self, gateType: int, *fanins: str) -> str:
+        self.gates.append(f"{gateType} {' '.join(fanins)} 0")
+        return f"{len(self.gates)}.1"
+
+    def addXor(self, a: str, b: str) -> str:
+        both = self.addGate(1, a, b)
+        return self.addGate(1, self.addGate(2, a, b), self.addGate(3, both))
+
+    def addHalfAdder(self, a: str, b: str) -> Tuple[str, str]:
+        # (sum, carry)
+        return self.addXor(a, b), self.addGate(1, a, b)
+
+    def addFullAdder(self, a: str, b: str, c: str) -> Tuple[str, str]:
+        half = self.addXor(a, b)
+        total = self.addXor(half, c)
+        return total, self.addGate(2, self.addGate(1, a, b),
+                                   self.addGate(1, half, c))
+
+    def getLcf(self) -> str:
+        return "\n".join([str(self.pinCount), str(len(self.gates))] +
+                         self.gates)
+
+
+def adderLcf(bits: int) -> str:
+    # ripple-carry adder, pins a0..a(n-1) then b0..b(n-1)
+    builder = LcfBuilder(bits << 1)
+    carry = ""
+    for i in range(bits):
+        a, b = builder.pin(i), builder.pin(bits + i)
+        if carry:
+            _, carry = builder.addFullAdder(a, b, carry)
+        else:
+            _, carry = builder.addHalfAdder(a, b)
+    return builder.getLcf()
+
+
+def multiplierLcf(bits: int) -> str:
+    # array multiplier, pins a0..a(n-1) then b0..b(n-1), the partial
+    # products of every column are reduced by full and half adders
+    builder = LcfBuilder(bits << 1)
+    columns: List[List[str]] = [[] for _ in range(bits << 1)]
+    for i in range(bits):
+        for j in range(bits):
+            columns[i + j].append(builder.addGate(
+                1, builder.pin(i), builder.pin(bits + j)))
+    for weight, column in enumerate(columns):
+        while len(column) > 1:
+            if weight + 1 == len(columns):  # no carry out of the product
+                column.append(builder.addXor(column.pop(), column.pop()))
+                continue
+            if len(column) > 2:
+                total, carry = builder.addFullAdder(
+                    column.pop(), column.pop(), column.pop())
+            else:
+                total, carry = builder.addHalfAdder(column.pop(), column.pop())
+            column.append(total)
+            columns[weight + 1].append(carry)
+    # buffers keep the output pins in weight order
+    for column in columns:
+        if column:
+            builder.addGate(1, column[0])
+    return builder.getLcf()
+
+
+def fanoutTreeLcf(gateCount: int) -> str:
+    # one NOT gate drives every AND gate, an OR tree reduces them again
+    pinCount = 16
+    builder = LcfBuilder(pinCount)
+    root = builder.addGate(3, builder.pin(0))
+    leaves = [builder.addGate(1, root, builder.pin(1 + i % (pinCount - 1)))
+              for i in range(max(1, (gateCount - 1) >> 1))]
+    while len(leaves) > 1:
+        leaves = [builder.addGate(2, *leaves[i:i + 2]) if i + 1 < len(leaves)
+                  else leaves[i] for i in range(0, len(leaves), 2)]
+    return builder.getLcf()
+
+
+def timeSimulation(lcf: str, repeat: int = 100) -> float:
+    logicSimulator = LogicSimulator(cacheSize=0)
+    assert logicSimulator.load(lcf)
+    start = perf_counter()
+    for _ in range(repeat):
+        logicSimulator.getSimulateOutput()
+    return (perf_counter() - start) / repeat
+
+
+def benchmarkScaling(generator: Callable[[int], str],
+                     sizes: Tuple[int, ...] = (125, 250, 500, 1000)
+                     ) -> List[Tuple[int, float]]:
+    return [(size, timeSimulation(generator(size))) for size in sizes]
+
+
+def timeTruthTable(lcf: str, mode: TruthTableMode) -> float:
+    logicSimulator = LogicSimulator()
+    assert logicSimulator.load(lcf)
+    start = perf_counter()
+    logicSimulator.getTruthTable(mode)
+    return perf_counter() - start
+
+
+def timeFormatCheck(lcf: str) -> Tuple[float, float]:
+    # (regex, tokenizer) seconds for checking the format of lcf
+    pin = r"-([0-9])*?"  # -3
+    gate = r"([0-9])*?.([0-9])*?"  # 3.1
+    gateinfo = r"[1-3]" + rf"( ({pin}|{gate}))+?" + " 0"  # 1 -1 2.1 0
+    lcfFormat = r"([0-9])*?\n" * 2 + rf"({gateinfo}\n)*?{gateinfo}(\n)?"
+    start = perf_counter()
+    fullmatch(lcfFormat, lcf)
+    regex = perf_counter() - start
+    start = perf_counter()
+    LogicSimulator().isLcfFormat(lcf)
+    return regex, perf_counter() - start
+
+
+def benchmarkCompact(gateCount: int) -> Tuple[float, float, float]:
+    # (load seconds, simulate seconds, netlist bytes per gate)
+    logicSimulator = LogicSimulator(16, gateCount, compact=True)
+    lcf = randomLcf(16, gateCount)
+    start = perf_counter()
+    assert logicSimulator.load(lcf)
+    load = perf_counter() - start
+    start = perf_counter()
+    logicSimulator.getSimulateOutput()
+    simulate = perf_counter() - start
+    netlist = logicSimulator.netlist
+    size = sum(len(a) * a.itemsize for a in (
+        netlist.faninOffsets, netlist.faninIndices, netlist.gateIds,
+        netlist.outputs)) + len(netlist.gateTypes)
+    return load, simulate, size / gateCount
+
+
+def benchmarkWorkers(lcf: str, workerCounts: Tuple[int, ...]
+                     ) -> List[Tuple[int, float]]:
+    results = []
+    for workers in workerCounts:
+        logicSimulator = LogicSimulator(workers=workers)
+        assert logicSimulator.load(lcf)
+        start = perf_counter()
+        logicSimulator.getTruthTable(TruthTableMode.multiProcess)
+        results.append((workers, perf_counter() - start))
+    return results
+
+
+def _printFormatCheck(name: str, sizes: Tuple[int, ...], suffix: str) -> None:
+    print(name)
+    print(" gates | regex ms | tokenizer ms")
+    for size in sizes:
+        regex, tokenizer = timeFormatCheck(randomLcf(16, size) + suffix)
+        print(f"{size:6} | {regex * 1e3:8.2f} | {tokenizer * 1e3:12.2f}")
+
+
+def _printScaling(name: str, results: List[Tuple[int, float]]) -> None:
+    print(name)
+    print("gates | us/vector | us/gate")
+    for size, seconds in results:
+        print(f"{size:5} | {seconds * 1e6:9.1f} | {seconds * 1e6 / size:7.3f}")
+
+
+# generator and sizes of every suite circuit
+SUITE: Dict[str, Tuple[Callable[[int], str], Tuple[int, ...]]] = {
+    "randomDag": (lambda size: randomLcf(16, size), (100, 1000, 10000)),
+    "adder": (adderLcf, (4, 8, 64)),
+    "multiplier": (multiplierLcf, (4, 8, 16)),
+    "notChain": (notChainLcf, (100, 1000, 10000)),
+    "fanoutTree": (fanoutTreeLcf, (100, 1000, 10000)),
+}
+
+
+def timeBest(function: Callable[[], object], repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        best = min(best, perf_counter() - start)
+    return best
+
+
+def benchmarkCircuit(lcf: str) -> Dict[str, Optional[float]]:
+    logicSimulator = LogicSimulator(1 << 10, 1 << 20, cacheSize=0)
+    load = timeBest(lambda: LogicSimulator(1 << 10, 1 << 20).load(lcf))
+    assert logicSimulator.load(lcf)
+    pinCount, oPinCount = len(logicSimulator.iPins), len(logicSimulator.oPins)
+    result: Dict[str, Optional[float]] = {
+        "pins": pinCount, "gates": len(logicSimulator.circuit),
+        "outputs": oPinCount, "load": load,
+        "simulate": timeBest(logicSimulator.getSimulateOutput, 20),
+        "truthTable": None}
+    # skip truth tables that are too big to format
+    if pinCount <= 16 and (pinCount + oPinCount) << pinCount <= 1 << 22:
+        result["truthTable"] = timeBest(lambda: logicSimulator.getTruthTable(
+            TruthTableMode.bitParallel), 1)
+    return result
+
+
+def runSuite(quick: bool = False) -> Dict[str, object]:
+    results = {}
+    for name, (generator, sizes) in SUITE.items():
+        for size in sizes[:2] if quick else sizes:
+            results[f"{name}/{size}"] = benchmarkCircuit(generator(size))
+    return {"python": python_version(), "results": results}
+
+
+def compareResults(baseline: Dict[str, object], current: Dict[str, object],
+                   tolerance: float = 1.5, noise: float = 5e-3) -> List[str]:
+    # regressions slower than tolerance times the baseline
+    regressions = []
+    for key, result in current["results"].items():
+        previous = baseline["results"].get(key)
+        if previous is None:
+            continue
+        for metric in ("load", "simulate", "truthTable"):
+            old, new = previous.get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            if new > old * tolerance and new - old > noise:
+                regressions.append(
+                    f"{key} {metric}: {old:.6f} s -> {new:.6f} s")
+    return regressions
+
+
+def _printSuite(suite: Dict[str, object]) -> None:
+    print("circuit           | pins |  gates | load s | simulate ms | truth table s")
+    for key, result in suite["results"].items():
+        truthTable = "-" if result["truthTable"] is None \
+            else f"{result['truthTable']:.3f}"
+        print(f"{key:17} | {result['pins']:4} | {result['gates']:6} | "
+              f"{result['load']:6.3f} | {result['simulate'] * 1e3:11.3f} | "
+              f"{truthTable:>13}")
+
+
+def _printEngines() -> None:
+    _printScaling("NOT chain", benchmarkScaling(notChainLcf))
+    _printScaling("reconvergent fan-out", benchmarkScaling(reconvergentLcf))
+    _printFormatCheck("valid lcf", (1000, 10000, 100000), "")
+    # a trailing token makes the regex backtrack exponentially
+    _printFormatCheck("invalid lcf", (2, 4, 6, 8), " 5")
+    print("compact netlist")
+    print("  gates | load s | simulate s | bytes/gate")
+    for size in (10000, 100000, 1000000):
+        load, simulate, bytesPerGate = benchmarkCompact(size)
+        print(f"{size:7} | {load:6.2f} | {simulate:10.3f} | {bytesPerGate:10.1f}")
+    lcf = randomLcf(16, 1000)
+    print("16-pin 1000-gate truth table across processes")
+    print("workers | seconds | speedup")
+    results = benchmarkWorkers(lcf, (1, 2, 4, 8))
+    for workers, seconds in results:
+        print(f"{workers:7} | {seconds:7.3f} | {results[0][1] / seconds:7.2f}")
+    lcf = randomLcf(16, 200)
+    print("16-pin truth table")
+    for mode in TruthTableMode:
+        print(f"{mode.name:12}: {timeTruthTable(lcf, mode):.3f} s")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="benchmark the logic simulator")
+    parser.add_argument("--json", type=Path, help="write the results here")
+    parser.add_argument("--compare", type=Path,
+                        help="fail on regressions against these results")
+    parser.add_argument("--tolerance", type=float, default=1.5,
+                        help="slowdown factor reported as a regression")
+    parser.add_argument("--quick", action="store_true",
+                        help="only the smaller circuits")
+    parser.add_argument("--engines", action="store_true",
+                        help="compare the simulation engines instead")
+    args = parser.parse_args()
+    if args.engines:
+        _printEngines()
+        sys.exit(0)
+    suite = runSuite(args.quick)
+    _printSuite(suite)
+    if args.json is not None:
+        with open(args.json, "w") as resultFile:
+            json.dump(suite, resultFile, indent=2)
+    if args.compare is not None:
+        with open(args.compare, "r") as baselineFile:
+            regressions = compareResults(
+                json.load(baselineFile), suite, args.tolerance)
+        for regression in regressions:
+            print(f"regression: {regression}")
+        sys.exit(1 if regressions else 0)
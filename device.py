@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import List, Self
+from typing import Dict, List, Self
 
 
 class DeviceType(Enum):
@@ -10,15 +10,23 @@ class DeviceType(Enum):
     oPin = 5
 
 
+# getOutput reads the cached output of each fan-in device instead of
+# recursing, so fan-in must be evaluated first (see LogicSimulator.order).
+# Outputs may be bit-packed words, mask has a 1 for every packed bit.
 class Device:
     def __init__(self) -> None:
         self.iPins: List[Device] = []
+        # devices reading this output, for event-driven simulation
+        self.fanouts: List[Device] = []
+        # topological level, fan-in always has a lower level
+        self.level: int = 0
         self.output: int = 0
 
     def addInputPin(self, device: Self) -> None:
         self.iPins.append(device)
+        device.fanouts.append(self)
 
-    def getOutput(self) -> int:
+    def getOutput(self, mask: int = 1) -> int:
         return self.output
 
 
@@ -26,8 +34,8 @@ class OPin(Device):
     def __init__(self) -> None:
         super().__init__()
 
-    def getOutput(self) -> int:
-        self.output = self.iPins[0].getOutput()
+    def getOutput(self, mask: int = 1) -> int:
+        self.output = self.iPins[0].output
         return self.output
 
 
@@ -41,8 +49,8 @@ class GateNot(Device):
     def __init__(self) -> None:
         super().__init__()
 
-    def getOutput(self) -> int:
-        self.output = 1 - self.iPins[0].getOutput()
+    def getOutput(self, mask: int = 1) -> int:
+        self.output = mask ^ self.iPins[0].output
         return self.output
 
 
@@ -50,11 +58,11 @@ class GateAND(Device):
     def __init__(self) -> None:
         super().__init__()
 
-    def getOutput(self) -> int:
-        self.output = 1
+    def getOutput(self, mask: int = 1) -> int:
+        self.output = mask
         for pin in self.iPins:
-            if pin.getOutput() == 0:
-                self.output = 0
+            self.output &= pin.output
+            if self.output == 0:
                 break
         return self.output
 
@@ -63,11 +71,11 @@ class GateOR(Device):
     def __init__(self) -> None:
         super().__init__()
 
-    def getOutput(self) -> int:
+    def getOutput(self, mask: int = 1) -> int:
         self.output = 0
         for pin in self.iPins:
-            if pin.getOutput() == 1:
-                self.output = 1
+            self.output |= pin.output
+            if self.output == mask:
                 break
         return self.output
 
@@ -87,3 +95,31 @@ class DeviceFactory:
             return IPin()
         if deviceType == DeviceType.oPin:
             return OPin()
+
+
+class DeviceProfiler:
+    # counts evaluations by shadowing getOutput on the attached device
+    # instances, detached devices run the plain class method again
+    def __init__(self) -> None:
+        self.evaluations: Dict[Device, int] = {}
+        # evaluations that changed the output
+        self.changes: Dict[Device, int] = {}
+
+    def attach(self, device: Device) -> None:
+        getOutput = device.getOutput
+        self.evaluations[device] = self.changes[device] = 0
+
+        def profiledGetOutput(mask: int = 1) -> int:
+            previous = device.output
+            output = getOutput(mask)
+            self.evaluations[device] += 1
+            if output != previous:
+                self.changes[device] += 1
+            return output
+        device.getOutput = profiledGetOutput
+
+    def detach(self, device: Device) -> None:
+        if "getOutput" in vars(device):
+            del device.getOutput
+        self.evaluations.pop(device, None)
+        self.changes.pop(device, None)
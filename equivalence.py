@@ -0,0 +1,125 @@
+from random import Random
+from typing import List, Optional, Tuple
+
+from device import DeviceType
+from logicSimulator import LogicSimulator, Netlist
+
+
+class EquivalenceChecker:
+    # miter of two circuits with the same pins, input and output pins are
+    # matched by position, the gates of both read the shared input pins and
+    # one output is 1 where any output pair differs; random vectors are
+    # simulated first, then every truth table row wordSize rows at a time
+
+    def __init__(self, first: LogicSimulator, second: LogicSimulator,
+                 wordSize: int = 1 << 12, seed: int = 0) -> None:
+        assert first.netlist is not None and second.netlist is not None
+        if len(first.iPins) != len(second.iPins) or \
+                len(first.oPins) != len(second.oPins):
+            raise ValueError(
+                f"pins differ: {len(first.iPins)} inputs and "
+                f"{len(first.oPins)} outputs against {len(second.iPins)} "
+                f"inputs and {len(second.oPins)} outputs")
+        self.pinCount = len(first.iPins)
+        self.wordSize = wordSize
+        self.random = Random(seed)
+        # miter signals of the output pins of either circuit
+        self.firstOutputs: List[int] = []
+        self.secondOutputs: List[int] = []
+        self.miter = self.buildMiter(first.netlist, second.netlist)
+        # vectors simulated so far
+        self.vectorCount = 0
+
+    def addGate(self, netlist: Netlist, gateType: DeviceType,
+                fanins: List[int]) -> int:
+        netlist.gateIds.append(len(netlist.gateTypes))
+        netlist.gateTypes.append(gateType.value)
+        netlist.faninIndices.extend(fanins)
+        netlist.faninOffsets.append(len(netlist.faninIndices))
+        return netlist.pinCount + len(netlist.gateTypes) - 1
+
+    def buildMiter(self, first: Netlist, second: Netlist) -> Netlist:
+        miter = Netlist()
+        miter.pinCount = pinCount = first.pinCount
+        for netlist, outputs in ((first, self.firstOutputs),
+                                 (second, self.secondOutputs)):
+            # pins stay, gates move behind the gates already in the miter
+            shift = len(miter.gateTypes)
+            offsets, fanins = netlist.faninOffsets, netlist.faninIndices
+            for k, gateType in enumerate(netlist.gateTypes):
+                self.addGate(miter, DeviceType(gateType), [
+                    i if i < pinCount else i + shift
+                    for i in fanins[offsets[k]:offsets[k + 1]]])
+            outputs.extend(i if i < pinCount else i + shift
+                           for i in netlist.outputs)
+        # a xor b as (a and not b) or (not a and b), ored over the outputs
+        differences = []
+        for a, b in zip(self.firstOutputs, self.secondOutputs):
+            notA = self.addGate(miter, DeviceType.gateNot, [a])
+            notB = self.addGate(miter, DeviceType.gateNot, [b])
+            differences.append(self.addGate(miter, DeviceType.gateOR, [
+                self.addGate(miter, DeviceType.gateAND, [a, notB]),
+                self.addGate(miter, DeviceType.gateAND, [notA, b])]))
+        miter.outputs.append(
+            self.addGate(miter, DeviceType.gateOR, differences))
+        return miter
+
+    def simulate(self, pinWords: List[int], mask: int) -> Optional[str]:
+        # the first vector of the words where the circuits differ
+        values = pinWords + [0] * len(self.miter.gateTypes)
+        self.miter.evaluate(values, mask)
+        self.vectorCount += mask.bit_length()
+        difference = values[self.miter.outputs[0]]
+        if not difference:
+            return None
+        r = (difference & -difference).bit_length() - 1
+        return "".join(str(word >> r & 1) for word in pinWords)
+
+    def checkRandom(self, vectorCount: int) -> Optional[str]:
+        for start in range(0, vectorCount, self.wordSize):
+            size = min(self.wordSize, vectorCount - start)
+            vector = self.simulate(
+                [self.random.getrandbits(size) for _ in range(self.pinCount)],
+                (1 << size) - 1)
+            if vector is not None:
+                return vector
+        return None
+
+    def checkExhaustive(self) -> Optional[str]:
+        # the first differing truth table row
+        rowCount = 1 << self.pinCount
+        wordSize = min(self.wordSize, rowCount)
+        for start in range(0, rowCount, wordSize):
+            vector = self.simulate(
+                LogicSimulator.getPinWords(self.pinCount, start, wordSize),
+                (1 << wordSize) - 1)
+            if vector is not None:
+                return vector
+        return None
+
+    def check(self, randomVectors: int = 1 << 16) -> Optional[str]:
+        # a differing input vector, None if the circuits are equivalent
+        vector = self.checkRandom(min(randomVectors, 1 << self.pinCount))
+        return vector if vector is not None else self.checkExhaustive()
+
+    def getOutputs(self, vector: str) -> Tuple[List[int], List[int]]:
+        # output pins of either circuit for one input vector
+        values = [int(value) for value in vector] + \
+            [0] * len(self.miter.gateTypes)
+        self.miter.evaluate(values)
+        return [values[i] for i in self.firstOutputs], \
+            [values[i] for i in self.secondOutputs]
+
+    def getReport(self, vector: Optional[str]) -> str:
+        if vector is None:
+            return f"Equivalent: {1 << self.pinCount} input vectors, " \
+                f"{self.vectorCount} simulated"
+        firstOutputs, secondOutputs = self.getOutputs(vector)
+        return "\n".join([
+            f"Not equivalent: {self.vectorCount} vectors simulated",
+            f"Input: {' '.join(vector)}",
+            f"First: {' '.join(map(str, firstOutputs))}",
+            f"Second: {' '.join(map(str, secondOutputs))}",
+            "Differing outputs: " + ", ".join(
+                str(j + 1) for j, (a, b) in enumerate(
+                    zip(firstOutputs, secondOutputs)) if a != b)])
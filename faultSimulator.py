@@ -0,0 +1,93 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from logicSimulator import LogicSimulator
+
+# (gate index in file order, stuck value)
+Fault = Tuple[int, int]
+
+
+class FaultSimulator:
+    # parallel-fault simulation of stuck-at-0/1 faults on the gate outputs,
+    # one device circuit evaluated on words where bit 0 is the fault-free
+    # circuit and bit b is the circuit with the b-th fault of a group, faults
+    # are dropped once a vector detects them
+
+    def __init__(self, logicSimulator: LogicSimulator,
+                 wordSize: int = 256) -> None:
+        assert logicSimulator.netlist is not None
+        # a device circuit of its own, the gate model takes the words
+        self.logicSimulator = LogicSimulator(
+            logicSimulator.maxPinCount, logicSimulator.maxGateCount,
+            cacheSize=0)
+        self.logicSimulator.build(logicSimulator.netlist)
+        self.wordSize = wordSize
+        self.faults: List[Fault] = [
+            (gate, value) for gate in range(len(self.logicSimulator.circuit))
+            for value in (0, 1)]
+        # detected faults and the first vector detecting each
+        self.detected: Dict[Fault, str] = {}
+        # gate index of every position in topological order
+        positions = {id(gate): n
+                     for n, gate in enumerate(self.logicSimulator.circuit)}
+        self.gateIndices = [positions[id(gate)]
+                            for gate in self.logicSimulator.order]
+
+    def simulate(self, vectors: Iterable[str]) -> int:
+        # vectors hold one "0"/"1" per input pin, returns the number of newly
+        # detected faults
+        detectedCount = len(self.detected)
+        remaining = [fault for fault in self.faults
+                     if fault not in self.detected]
+        for vector in vectors:
+            if not remaining:
+                break
+            groupSize = self.wordSize - 1
+            for start in range(0, len(remaining), groupSize):
+                self.simulateGroup(vector, remaining[start:start + groupSize])
+            remaining = [fault for fault in remaining
+                         if fault not in self.detected]
+        return len(self.detected) - detectedCount
+
+    def simulateTruthTable(self) -> int:
+        pinCount = len(self.logicSimulator.iPins)
+        return self.simulate(format(row, f"0{pinCount}b")
+                             for row in range(1 << pinCount))
+
+    def simulateGroup(self, vector: str, faults: List[Fault]) -> None:
+        mask = (1 << (len(faults) + 1)) - 1
+        # gate index to (bits kept, bits set) of its faulty copies
+        forced: Dict[int, Tuple[int, int]] = {}
+        for bit, (gate, value) in enumerate(faults, 1):
+            keep, stuck = forced.get(gate, (mask, 0))
+            forced[gate] = (keep & ~(1 << bit), stuck | value << bit)
+        for iPin, value in zip(self.logicSimulator.iPins, vector):
+            iPin.output = mask if value == "1" else 0
+        for gate, index in zip(self.logicSimulator.order, self.gateIndices):
+            output = gate.getOutput(mask)
+            if index in forced:
+                keep, stuck = forced[index]
+                gate.output = output & keep | stuck
+        differences = 0
+        for oPin in self.logicSimulator.oPins:
+            output = oPin.getOutput(mask)
+            differences |= output ^ (mask if output & 1 else 0)
+        for bit, fault in enumerate(faults, 1):
+            if differences >> bit & 1:
+                self.detected[fault] = vector
+
+    def getCoverage(self) -> float:
+        return len(self.detected) / len(self.faults)
+
+    def iterUndetected(self) -> Iterator[Fault]:
+        return (fault for fault in self.faults if fault not in self.detected)
+
+    def getReport(self, top: Optional[int] = 10) -> str:
+        undetected = list(self.iterUndetected())
+        lines = [f"Fault coverage: {len(self.detected)}/{len(self.faults)} "
+                 f"({self.getCoverage():.2%})"]
+        if undetected:
+            lines.append("Undetected: " + ", ".join(
+                f"gate {gate + 1} stuck-at-{value}"
+                for gate, value in undetected[:top]) +
+                (", ..." if top is not None and len(undetected) > top else ""))
+        return "\n".join(lines)
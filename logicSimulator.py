@@ -1,116 +1,1640 @@
-from re import fullmatch
-from typing import List
+from array import array
+from ast import literal_eval
+from bisect import bisect_left, insort
+from collections import Counter, OrderedDict
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from enum import Enum
+from functools import lru_cache
+from hashlib import sha256
+from heapq import heappop, heappush
+from io import StringIO
+from itertools import chain, repeat
+from mmap import ACCESS_READ, mmap
+from operator import attrgetter, gt, lt, sub
+from os import cpu_count
+from pathlib import Path
+from struct import Struct
+import sys
+from time import perf_counter
+from typing import (BinaryIO, Callable, Dict, Iterable, Iterator, List,
+                    Optional, Set, TextIO, Tuple, TypeVar, Union)
 
-from device import Device, DeviceFactory, DeviceType, IPin, OPin
+from bdd import BDD, getVariableOrder
+from device import (Device, DeviceFactory, DeviceProfiler, DeviceType, GateAND,
+                    GateNot, GateOR, IPin, OPin)
 
 
-class LogicSimulator:
+T = TypeVar("T")
+
+# compiled netlist file: magic, version, pin, gate, fan-in and output counts,
+# sha256 of the lcf text
+LCFB_MAGIC = b"LCFB"
+LCFB_VERSION = 1
+LCFB_HEADER = Struct("<4sHxxIIII32s")
+
+# packed truth table file: magic, version, pin and output counts, sha256 of
+# the lcf text, then one bit per row for every output, see PackedTruthTable
+PACKED_MAGIC = b"LCFT"
+PACKED_VERSION = 1
+PACKED_HEADER = Struct("<4sHxxII32s")
+NPY_MAGIC = b"\x93NUMPY"
+
+
+class LcfFormatError(ValueError):
+    def __init__(self, message: str, line: int = 0, column: int = 0) -> None:
+        super().__init__(
+            f"line {line}, column {column}: {message}" if line else message)
+        self.line = line
+        self.column = column
+
+
+class TruthTableMode(Enum):
+    serial = 1
+    bitParallel = 2
+    grayCode = 3
+    multiProcess = 4
+    compiled = 5
+    # every output over the input pins it depends on only
+    cone = 6
+    # rows read from the binary decision diagram of every output
+    bdd = 7
+
+
+class Netlist:
+    # compact array-backed circuit, signals 0 to pinCount - 1 are the input
+    # pins and signal pinCount + k is gate k, the fan-in of gate k is
+    # faninIndices[faninOffsets[k]:faninOffsets[k + 1]]
+    __slots__ = ("pinCount", "gateTypes", "faninOffsets", "faninIndices",
+                 "gateIds", "outputs")
+
     def __init__(self) -> None:
-        self.circuit: List[Device] = []
+        self.pinCount = 0
+        # DeviceType values
+        self.gateTypes = bytearray()
+        self.faninOffsets = array("I", [0])
+        self.faninIndices = array("I")
+        # gate number (from 0) in the lcf file
+        self.gateIds = array("I")
+        # signals of the gates driving the output pins
+        self.outputs = array("I")
+
+    def __getstate__(self) -> Tuple:
+        # copies, the arrays of readBinary are memoryviews that do not pickle
+        return (self.pinCount, bytearray(self.gateTypes),
+                array("I", self.faninOffsets), array("I", self.faninIndices),
+                array("I", self.gateIds), array("I", self.outputs))
+
+    def __setstate__(self, state: Tuple) -> None:
+        self.pinCount, self.gateTypes, self.faninOffsets, \
+            self.faninIndices, self.gateIds, self.outputs = state
+
+    def sortTopologically(self) -> "Netlist":
+        # reorders the gates so fan-in comes first, finds output gates
+        pinCount = self.pinCount
+        gateCount = len(self.gateTypes)
+        offsets, fanins = self.faninOffsets, self.faninIndices
+        # fan-out of every gate in csr form
+        pending = array("I", bytes(4 * gateCount))
+        fanoutOffsets = array("I", bytes(4 * (gateCount + 1)))
+        for i in fanins:
+            if i >= pinCount:
+                fanoutOffsets[i - pinCount + 1] += 1
+        for k in range(gateCount):
+            fanoutOffsets[k + 1] += fanoutOffsets[k]
+        fill = array("I", fanoutOffsets)
+        fanouts = array("I", bytes(4 * fanoutOffsets[-1]))
+        for k in range(gateCount):
+            for i in range(offsets[k], offsets[k + 1]):
+                if fanins[i] >= pinCount:
+                    j = fanins[i] - pinCount
+                    fanouts[fill[j]] = k
+                    fill[j] += 1
+                    pending[k] += 1
+        order = array("I", (k for k in range(gateCount) if pending[k] == 0))
+        for k in order:  # order grows while iterating
+            for i in range(fanoutOffsets[k], fanoutOffsets[k + 1]):
+                j = fanouts[i]
+                pending[j] -= 1
+                if pending[j] == 0:
+                    order.append(j)
+        if len(order) != gateCount:
+            raise LcfFormatError("circuit contains a cycle")
+        # new signal index of every old signal
+        signals = array("I", range(pinCount + gateCount))
+        for position, k in enumerate(order):
+            signals[pinCount + k] = pinCount + position
+        netlist = Netlist()
+        netlist.pinCount = pinCount
+        for k in order:
+            netlist.gateTypes.append(self.gateTypes[k])
+            netlist.faninIndices.extend(
+                signals[fanins[i]] for i in range(offsets[k], offsets[k + 1]))
+            netlist.faninOffsets.append(len(netlist.faninIndices))
+            netlist.gateIds.append(self.gateIds[k])
+        netlist.outputs.extend(
+            signals[pinCount + k] for k in range(gateCount)
+            if fanoutOffsets[k] == fanoutOffsets[k + 1])
+        if len(netlist.outputs) == 0:
+            raise LcfFormatError("circuit has no output gate")
+        return netlist
+
+    def evaluate(self, values: List[int], mask: int = 1) -> None:
+        # values holds one value (or bit-packed word) per signal, the input
+        # pin values are read and the gate values are written
+        gateAND, gateOR = DeviceType.gateAND.value, DeviceType.gateOR.value
+        offsets, fanins = self.faninOffsets, self.faninIndices
+        signal = self.pinCount
+        for k, gateType in enumerate(self.gateTypes):
+            begin, end = offsets[k], offsets[k + 1]
+            if gateType == gateAND:
+                value = mask
+                for i in range(begin, end):
+                    value &= values[fanins[i]]
+            elif gateType == gateOR:
+                value = 0
+                for i in range(begin, end):
+                    value |= values[fanins[i]]
+            else:
+                value = mask ^ values[fanins[begin]]
+            values[signal + k] = value
+
+    def optimize(self) -> "Netlist":
+        # equivalent netlist without duplicated gates, double inverters,
+        # one-input and constant gates or logic that reaches no output,
+        # self must be in topological order
+        gateAND, gateOR = DeviceType.gateAND.value, DeviceType.gateOR.value
+        gateNot = DeviceType.gateNot.value
+        pinCount = self.pinCount
+        offsets, fanins = self.faninOffsets, self.faninIndices
+        # every old signal maps to a new signal or to the constant 0 or 1,
+        # stored as -1 and -2
+        constants = (-1, -2)
+        signals: List[int] = list(range(pinCount))
+        gates: List[Tuple[int, Tuple[int, ...]]] = []
+        hashed: Dict[Tuple[int, Tuple[int, ...]], int] = {}
+        inverse: Dict[int, int] = {}  # new NOT gate to its fan-in
+
+        def addGate(gateType: int, gateFanins: Tuple[int, ...]) -> int:
+            signal = hashed.get((gateType, gateFanins))
+            if signal is None:
+                signal = hashed[gateType, gateFanins] = pinCount + len(gates)
+                gates.append((gateType, gateFanins))
+                if gateType == gateNot:
+                    inverse[signal] = gateFanins[0]
+            return signal
+        for k, gateType in enumerate(self.gateTypes):
+            if gateType == gateNot:
+                x = signals[fanins[offsets[k]]]
+                signals.append(
+                    constants[x == -1] if x < 0 else inverse[x] if x in inverse
+                    else addGate(gateNot, (x,)))
+                continue
+            identity, absorbing = constants[gateType == gateAND], \
+                constants[gateType == gateOR]
+            inputs = {signals[fanins[i]]
+                      for i in range(offsets[k], offsets[k + 1])}
+            inputs.discard(identity)
+            if absorbing in inputs or any(inverse.get(x) in inputs
+                                          for x in inputs):
+                signals.append(absorbing)
+            elif not inputs:
+                signals.append(identity)
+            elif len(inputs) == 1:
+                signals.append(inputs.pop())
+            else:
+                signals.append(addGate(gateType, tuple(sorted(inputs))))
+        outputs = [signals[i] for i in self.outputs]
+        # keep the gates reaching an output
+        live = bytearray(pinCount + len(gates))
+        for i in outputs:
+            if i >= 0:
+                live[i] = 1
+        for k in range(len(gates) - 1, -1, -1):
+            if live[pinCount + k]:
+                for i in gates[k][1]:
+                    live[i] = 1
+        renamed = list(range(pinCount)) + [0] * len(gates)
+        netlist = Netlist()
+        netlist.pinCount = pinCount
+
+        def appendGate(gateType: int, gateFanins: Iterable[int]) -> int:
+            netlist.gateTypes.append(gateType)
+            netlist.faninIndices.extend(gateFanins)
+            netlist.faninOffsets.append(len(netlist.faninIndices))
+            return pinCount + len(netlist.gateTypes) - 1
+        for k, (gateType, gateFanins) in enumerate(gates):
+            if live[pinCount + k]:
+                renamed[pinCount + k] = appendGate(
+                    gateType, (renamed[i] for i in gateFanins))
+        # every output needs a gate of its own without fan-out, pins and
+        # gates with fan-out get a buffer, a gate already driving an output
+        # gets a copy (a buffer would give it fan-out), constants are built
+        # from a signal and its inverter as the format has no constant gate
+        fanoutCounts = Counter(netlist.faninIndices)
+        driving: Set[int] = set()
+        # an inverter already reading into gates, else pin 1 inverted
+        signal, inverter = 0, None
+        for k, gateType in enumerate(netlist.gateTypes):
+            if gateType == gateNot and fanoutCounts[pinCount + k]:
+                signal = netlist.faninIndices[netlist.faninOffsets[k]]
+                inverter = pinCount + k
+                break
+        for position, i in enumerate(outputs):
+            if i < 0:
+                if inverter is None:
+                    inverter = appendGate(gateNot, (signal,))
+                i = appendGate(gateAND if i == -1 else gateOR,
+                               (signal, inverter))
+            else:
+                i = renamed[i]
+                if i < pinCount or fanoutCounts[i]:
+                    i = appendGate(gateAND, (i,))
+                elif i in driving:
+                    k = i - pinCount
+                    i = appendGate(netlist.gateTypes[k], netlist.faninIndices[
+                        netlist.faninOffsets[k]:netlist.faninOffsets[k + 1]])
+                driving.add(i)
+            outputs[position] = i
+        netlist.outputs.extend(outputs)
+        # outputs are numbered last, in their order, so the lcf text keeps
+        # the output order
+        gateIds = array("I", bytes(4 * len(netlist.gateTypes)))
+        number = 0
+        outputSet = set(outputs)
+        for k in range(len(netlist.gateTypes)):
+            if pinCount + k not in outputSet:
+                gateIds[k] = number
+                number += 1
+        for i in outputs:
+            gateIds[i - pinCount] = number
+            number += 1
+        netlist.gateIds = gateIds
+        return netlist
+
+    def getSupports(self) -> List[Tuple[int, ...]]:
+        # input pins each output depends on, in pin order
+        offsets, fanins = self.faninOffsets, self.faninIndices
+        supports = [1 << i for i in range(self.pinCount)]
+        for k in range(len(self.gateTypes)):
+            support = 0
+            for i in range(offsets[k], offsets[k + 1]):
+                support |= supports[fanins[i]]
+            supports.append(support)
+        return [tuple(i for i in range(self.pinCount) if supports[j] >> i & 1)
+                for j in self.outputs]
+
+    def extractCone(self, outputs: Sequence[int],
+                    pins: Sequence[int]) -> "Netlist":
+        # the gates outputs (indices into self.outputs) depend on, pins must
+        # hold their support and become input pins 0 to len(pins) - 1
+        pinCount = self.pinCount
+        offsets, fanins = self.faninOffsets, self.faninIndices
+        inCone = bytearray(pinCount + len(self.gateTypes))
+        for j in outputs:
+            inCone[self.outputs[j]] = 1
+        for k in range(len(self.gateTypes) - 1, -1, -1):
+            if inCone[pinCount + k]:
+                for i in range(offsets[k], offsets[k + 1]):
+                    inCone[fanins[i]] = 1
+        signals = array("I", bytes(4 * len(inCone)))
+        for position, i in enumerate(pins):
+            signals[i] = position
+        netlist = Netlist()
+        netlist.pinCount = len(pins)
+        for k, gateType in enumerate(self.gateTypes):
+            if inCone[pinCount + k]:
+                signals[pinCount + k] = \
+                    netlist.pinCount + len(netlist.gateTypes)
+                netlist.gateIds.append(len(netlist.gateTypes))
+                netlist.gateTypes.append(gateType)
+                netlist.faninIndices.extend(
+                    signals[fanins[i]] for i in range(offsets[k], offsets[k + 1]))
+                netlist.faninOffsets.append(len(netlist.faninIndices))
+        netlist.outputs.extend(signals[self.outputs[j]] for j in outputs)
+        return netlist
+
+    def toLcf(self) -> str:
+        # lcf text with the gates in their original order
+        lines = [str(self.pinCount), str(len(self.gateTypes))] + \
+            [""] * len(self.gateTypes)
+        offsets, fanins = self.faninOffsets, self.faninIndices
+        for k, gateId in enumerate(self.gateIds):
+            devices = [f"-{i + 1}" if i < self.pinCount
+                       else f"{self.gateIds[i - self.pinCount] + 1}.1"
+                       for i in fanins[offsets[k]:offsets[k + 1]]]
+            lines[2 + gateId] = f"{self.gateTypes[k]} {' '.join(devices)} 0"
+        return "\n".join(lines) + "\n"
+
+    def writeBinary(self, file: BinaryIO, lcfHash: Optional[str]) -> None:
+        # little-endian header, then every array padded to 4 bytes
+        file.write(LCFB_HEADER.pack(
+            LCFB_MAGIC, LCFB_VERSION, self.pinCount, len(self.gateTypes),
+            len(self.faninIndices), len(self.outputs),
+            bytes.fromhex(lcfHash) if lcfHash else bytes(32)))
+        file.write(self.gateTypes)
+        file.write(bytes(-len(self.gateTypes) % 4))
+        for values in (self.faninOffsets, self.faninIndices, self.gateIds,
+                       self.outputs):
+            values = array("I", values)
+            if sys.byteorder == "big":
+                values.byteswap()
+            file.write(values.tobytes())
+
+    @staticmethod
+    def readBinary(buffer: Union[bytes, mmap]) -> Tuple["Netlist", Optional[str]]:
+        # netlist viewing the arrays inside buffer without copying them, and
+        # the hash of the original lcf text
+        if len(buffer) < LCFB_HEADER.size:
+            raise LcfFormatError("truncated lcfb header")
+        magic, version, pinCount, gateCount, faninCount, outputCount, \
+            lcfHash = LCFB_HEADER.unpack_from(buffer)
+        if magic != LCFB_MAGIC:
+            raise LcfFormatError("not an lcfb file")
+        if version != LCFB_VERSION:
+            raise LcfFormatError(f"unsupported lcfb version {version}")
+        offset = LCFB_HEADER.size + gateCount + (-gateCount % 4)
+        counts = (gateCount + 1, faninCount, gateCount, outputCount)
+        if len(buffer) != offset + 4 * sum(counts):
+            raise LcfFormatError("lcfb size does not match its header")
+        view = memoryview(buffer)
+        netlist = Netlist()
+        netlist.pinCount = pinCount
+        netlist.gateTypes = view[LCFB_HEADER.size:LCFB_HEADER.size + gateCount]
+        arrays = []
+        for count in counts:
+            values = view[offset:offset + 4 * count]
+            if sys.byteorder == "big":
+                values = array("I", values.tobytes())
+                values.byteswap()
+                arrays.append(values)
+            else:
+                arrays.append(values.cast("I"))
+            offset += 4 * count
+        netlist.faninOffsets, netlist.faninIndices, netlist.gateIds, \
+            netlist.outputs = arrays
+        netlist.validate()
+        return netlist, lcfHash.hex() if any(lcfHash) else None
+
+    def validate(self) -> None:
+        # a netlist from outside must be topologically ordered and in range,
+        # checked with map over whole arrays as a loop per gate would take
+        # most of the load time, still about a third of it
+        pinCount = self.pinCount
+        gateCount = len(self.gateTypes)
+        offsets, fanins = self.faninOffsets, self.faninIndices
+        if offsets[0] != 0 or offsets[gateCount] != len(fanins):
+            raise LcfFormatError("lcfb fan-in offsets out of range")
+        gateTypes = bytes(self.gateTypes)
+        if gateTypes.translate(None, bytes(range(
+                DeviceType.gateAND.value, DeviceType.gateNot.value + 1))):
+            k = next(k for k, gateType in enumerate(gateTypes)
+                     if gateType not in (DeviceType.gateAND.value,
+                                         DeviceType.gateOR.value,
+                                         DeviceType.gateNot.value))
+            raise LcfFormatError(f"lcfb gate {k} has type {gateTypes[k]}")
+        starts, stops = offsets[:gateCount], offsets[1:]
+        if not all(map(lt, starts, stops)):
+            k = list(map(lt, starts, stops)).index(False)
+            raise LcfFormatError(f"lcfb gate {k} has no fan-in")
+        # every fan-in is below the signal of its gate, pinCount + k for gate k
+        bounds = array("I", chain.from_iterable(map(
+            repeat, range(pinCount, pinCount + gateCount),
+            map(sub, stops, starts))))
+        if not all(map(gt, bounds, fanins)):
+            i = list(map(gt, bounds, fanins)).index(False)
+            raise LcfFormatError(
+                f"lcfb gate {bounds[i] - pinCount} is not in topological order")
+        if gateCount and max(self.gateIds) >= gateCount or \
+                len(set(self.gateIds)) != gateCount:
+            raise LcfFormatError("lcfb gate ids are not a permutation")
+        if not self.outputs or min(self.outputs) < pinCount or \
+                max(self.outputs) >= pinCount + gateCount:
+            raise LcfFormatError("lcfb outputs out of range")
+
+    def toPythonSource(self, name: str = "simulate") -> str:
+        # straight-line function of the input pin values returning the output
+        # values, works on 0/1 ints and on bit-packed words with a mask
+        signals = [f"s{i}" for i in range(self.pinCount)]
+        lines = [f"def {name}({', '.join(signals + ['mask=1'])}):"]
+        operators = {DeviceType.gateAND.value: " & ",
+                     DeviceType.gateOR.value: " | "}
+        offsets, fanins = self.faninOffsets, self.faninIndices
+        for k, gateType in enumerate(self.gateTypes):
+            signal = f"s{self.pinCount + k}"
+            operands = [f"s{fanins[i]}"
+                        for i in range(offsets[k], offsets[k + 1])]
+            if gateType not in operators:
+                lines.append(f"    {signal} = {operands[0]} ^ mask")
+                continue
+            # 64 operands per statement, a longer expression nests too deep
+            # for the compiler
+            operator = operators[gateType]
+            lines.append(f"    {signal} = {operator.join(operands[:64])}")
+            for start in range(64, len(operands), 64):
+                lines.append(f"    {signal} {operator.strip()}= "
+                             f"{operator.join(operands[start:start + 64])}")
+        lines.append(f"    return [{', '.join(f's{i}' for i in self.outputs)}]")
+        return "\n".join(lines) + "\n"
+
+    def getLevels(self) -> array:
+        # logic depth of every gate, gates reading only pins are level 1
+        levels = array("I", bytes(4 * (self.pinCount + len(self.gateTypes))))
+        offsets, fanins = self.faninOffsets, self.faninIndices
+        for k in range(len(self.gateTypes)):
+            levels[self.pinCount + k] = 1 + max(
+                levels[fanins[i]] for i in range(offsets[k], offsets[k + 1]))
+        return levels[self.pinCount:]
+
+    def getFanoutCounts(self) -> array:
+        # number of gate inputs driven by every gate
+        counts = array("I", bytes(4 * (self.pinCount + len(self.gateTypes))))
+        for i in self.faninIndices:
+            counts[i] += 1
+        return counts[self.pinCount:]
+
+
+class SignalView:
+    # stands in for a device of a compact circuit
+    __slots__ = ("values", "index")
+
+    def __init__(self, values: List[int], index: int) -> None:
+        self.values = values
+        self.index = index
+
+    @property
+    def output(self) -> int:
+        return self.values[self.index]
+
+    @output.setter
+    def output(self, value: int) -> None:
+        self.values[self.index] = value
+
+    def getOutput(self, mask: int = 1) -> int:
+        return self.values[self.index]
+
+
+class GateViews(Sequence):
+    # circuit of a compact circuit, indexed by gate number in the lcf file
+    __slots__ = ("values", "signals")
+
+    def __init__(self, netlist: Netlist, values: List[int]) -> None:
+        self.values = values
+        self.signals = array("I", bytes(4 * len(netlist.gateIds)))
+        for position, gateId in enumerate(netlist.gateIds):
+            self.signals[gateId] = netlist.pinCount + position
+
+    def __len__(self) -> int:
+        return len(self.signals)
+
+    def __getitem__(self, index: int) -> SignalView:
+        return SignalView(self.values, self.signals[index])
+
+
+def formatHeader(iPinCount: int, outputs: Sequence[int]) -> str:
+    # truth table header, outputs are 0 based output pin indices
+    oPinCount = len(outputs)
+    header = f"{'i ' * iPinCount}|{' o' * oPinCount}\n"
+    iPinIDs = map(str, range(1, iPinCount+1))
+    oPinIDs = (str(j + 1) for j in outputs)
+    header += " ".join(iPinIDs) + " | " + " ".join(oPinIDs) + "\n"\
+        f"{'-' * (iPinCount << 1)}+{'-' * (oPinCount << 1)}"
+    return header
+
+
+class PackedTruthTable:
+    # memory-mapped packed truth table, output j is a column of one bit per
+    # row, row r at bit r % 8 of byte r // 8, columns padded to whole bytes;
+    # .npy files hold the same columns as a uint8 array of shape (outputs,
+    # column bytes) and do not record the pin count, which is needed for
+    # tables of one byte columns, 3 pins or fewer; close the table, or use it
+    # in a with statement, once no column views are left
+
+    def __init__(self, path: Path, pinCount: Optional[int] = None) -> None:
+        with open(path, "rb") as file:
+            try:
+                self.buffer = mmap(file.fileno(), 0, access=ACCESS_READ)
+            except ValueError:  # empty file
+                raise LcfFormatError("truncated truth table header")
+        try:
+            self.readHeader(pinCount)
+        except LcfFormatError:
+            self.close()
+            raise
+
+    def __enter__(self) -> "PackedTruthTable":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.buffer.close()
+
+    def readHeader(self, pinCount: Optional[int]) -> None:
+        self.lcfHash: Optional[str] = None
+        if self.buffer[:len(NPY_MAGIC)] == NPY_MAGIC:
+            self.outputCount, columnBytes, self.offset = self.readNpyHeader()
+            if pinCount is None:
+                if columnBytes == 1:
+                    raise LcfFormatError(
+                        "pin count of an npy table of 1 byte columns is "
+                        "ambiguous, 1 to 3 pins")
+                pinCount = (columnBytes << 3).bit_length() - 1
+        elif self.buffer[:4] == PACKED_MAGIC and \
+                len(self.buffer) >= PACKED_HEADER.size:
+            _, version, pinCount, self.outputCount, lcfHash = \
+                PACKED_HEADER.unpack_from(self.buffer)
+            if version != PACKED_VERSION:
+                raise LcfFormatError(f"unsupported truth table version {version}")
+            self.lcfHash = lcfHash.hex() if any(lcfHash) else None
+            self.offset = PACKED_HEADER.size
+        else:
+            raise LcfFormatError("not a packed truth table")
+        self.pinCount: int = pinCount
+        self.columnBytes = ((1 << pinCount) + 7) >> 3
+        if len(self.buffer) != self.offset + self.outputCount * self.columnBytes:
+            raise LcfFormatError("truth table size does not match its header")
+
+    @staticmethod
+    def write(file: BinaryIO, pinCount: int, words: List[int], npy: bool = False,
+              lcfHash: Optional[str] = None) -> None:
+        # words holds the column of every output, bit r is row r
+        columnBytes = ((1 << pinCount) + 7) >> 3
+        if npy:
+            header = "{'descr': '|u1', 'fortran_order': False, " \
+                f"'shape': ({len(words)}, {columnBytes}), }}"
+            # version 1.0 header, padded with spaces to 64 bytes and a newline
+            header += " " * (-(len(NPY_MAGIC) + 5 + len(header)) % 64) + "\n"
+            file.write(NPY_MAGIC + b"\x01\x00" +
+                       len(header).to_bytes(2, "little") + header.encode())
+        else:
+            file.write(PACKED_HEADER.pack(
+                PACKED_MAGIC, PACKED_VERSION, pinCount, len(words),
+                bytes.fromhex(lcfHash) if lcfHash else bytes(32)))
+        for word in words:
+            file.write(word.to_bytes(columnBytes, "little"))
+
+    def readNpyHeader(self) -> Tuple[int, int, int]:
+        # shape and data offset of a 2-d uint8 c-order array
+        if len(self.buffer) < len(NPY_MAGIC) + 2:
+            raise LcfFormatError("truncated npy header")
+        major = self.buffer[len(NPY_MAGIC)]
+        start = len(NPY_MAGIC) + (4 if major == 1 else 6)
+        size = int.from_bytes(self.buffer[len(NPY_MAGIC) + 2:start], "little")
+        if len(self.buffer) < start + size:
+            raise LcfFormatError("truncated npy header")
+        try:
+            header = literal_eval(self.buffer[start:start + size].decode("latin1"))
+            shape = header["shape"]
+            if header["descr"] not in ("|u1", "u1", "<u1") or \
+                    header["fortran_order"] or len(shape) != 2 or \
+                    not all(isinstance(n, int) and n > 0 for n in shape):
+                raise ValueError(header)
+        except (SyntaxError, ValueError, KeyError, TypeError) as error:
+            raise LcfFormatError(f"unsupported npy header: {error}")
+        return shape[0], shape[1], start + size
+
+    def __len__(self) -> int:
+        return 1 << self.pinCount
+
+    def getValue(self, i: int, j: int) -> int:
+        # output j in row i
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.buffer[self.offset + j * self.columnBytes + (i >> 3)] >> \
+            (i & 7) & 1
+
+    def row(self, i: int) -> List[int]:
+        return [self.getValue(i, j) for j in range(self.outputCount)]
+
+    def column(self, j: int) -> memoryview:
+        # packed bits of output j, without copying
+        if not 0 <= j < self.outputCount:
+            raise IndexError(j)
+        start = self.offset + j * self.columnBytes
+        return memoryview(self.buffer)[start:start + self.columnBytes]
+
+    def getHeader(self) -> str:
+        return formatHeader(self.pinCount, range(self.outputCount))
+
+    def iterText(self, wordSize: int = 1 << 12) -> Iterator[str]:
+        # the text truth table, wordSize rows (a multiple of 8) at a time
+        yield self.getHeader()
+        pinCount = self.pinCount
+        rowCount = len(self)
+        for start in range(0, rowCount, wordSize):
+            size = min(wordSize, rowCount - start)
+            columns = [format(int.from_bytes(
+                self.column(j)[start >> 3:(start + size + 7) >> 3], "little"),
+                f"0{size}b")[::-1][:size] for j in range(self.outputCount)]
+            for r, values in enumerate(zip(*columns)):
+                yield " ".join(format(start + r, f"0{pinCount}b")) + " | " + \
+                    " ".join(values)
+
+
+@lru_cache(maxsize=None)
+def _spreadMask(size: int, chunk: int) -> int:
+    # the low chunk bits of every 2 * chunk bits, size bits long
+    mask, length = (1 << chunk) - 1, chunk << 1
+    while length < size:
+        mask |= mask << length
+        length <<= 1
+    return mask
+
+
+# compiled circuit functions by lcf hash
+_compiledCircuits: Dict[str, Callable[..., List[int]]] = {}
+
+# circuit of a worker process, see LogicSimulator.iterMultiProcessRows
+_worker: Optional["LogicSimulator"] = None
+
+
+def _initWorker(netlist: Netlist) -> None:
+    global _worker
+    _worker = LogicSimulator(compact=True)
+    _worker.build(netlist)
+
+
+def _simulateRows(start: int, rowCount: int, wordSize: int) -> str:
+    # truth table rows start to start + rowCount as one block
+    return "\n".join(_worker.iterBitParallelRows(
+        wordSize, start, start + rowCount))
+
+
+class LogicSimulator:
+    def __init__(self, maxPinCount: int = 16, maxGateCount: int = 1000,
+                 compact: bool = False, cacheSize: int = 1 << 10,
+                 truthTableCacheDir: Optional[Path] = None,
+                 workers: Optional[int] = None) -> None:
+        self.maxPinCount = maxPinCount
+        self.maxGateCount = maxGateCount
+        # processes for multiProcess truth tables, None for every cpu
+        self.workers = workers
+        # smaller circuits are not worth starting processes for
+        self.PARALLEL_MIN_PIN_COUNT = 12
+        # input bitmask to output values, least recently used first
+        self.cache: OrderedDict[int, List[int]] = OrderedDict()
+        self.cacheSize = cacheSize
+        self.cacheHits = 0
+        self.cacheMisses = 0
+        # truth tables saved as <lcf hash>.txt
+        self.truthTableCacheDir = truthTableCacheDir
+        self.truthTableCacheHits = 0
+        self.truthTableCacheMisses = 0
+        # sha256 of the loaded lcf text
+        self.lcfHash: Optional[str] = None
+        # False while gate outputs may not match the input pins
+        self.settled = True
+        # compact circuits are simulated on the netlist arrays only
+        self.compact = compact
+        # True once the device circuit was edited, see netlist
+        self.edited = False
+        self.netlist = None
+        # signal values of a compact circuit
+        self.values: List[int] = []
+        self.circuit: Sequence = []
         self.iPins: List[Device] = []
         self.oPins: List[Device] = []
-        pin = r"-([0-9])*?"  # -3
-        gate = r"([0-9])*?.([0-9])*?"  # 3.1
-        gateinfo = r"[1-3]" + rf"( ({pin}|{gate}))+?" + " 0"  # 1 -1 2.1 0
-        self.LCF_FORMAT = r"([0-9])*?\n" * 2 + \
-            rf"({gateinfo}\n)*?{gateinfo}(\n)?"
+        # gates sorted by level, evaluated once per input vector, edits move
+        # only the gates whose level changes
+        self.order: List[Device] = []
+        # gate id (from 0) of every gate, see getGateIndex
+        self.gateIndex: Optional[Dict[Device, int]] = None
+        # devices to re-evaluate by the next settle, see addGate
+        self.dirty: Set[Device] = set()
+        # input pins of every output, see supports
+        self.outputSupports: Optional[List[Tuple[int, ...]]] = None
+        # set by getBdd, node of every output
+        self.bdd: Optional[BDD] = None
+        self.bddOutputs: List[int] = []
+        # why the last load failed
+        self.error: Optional[Union[LcfFormatError, OSError]] = None
+        # set by enableProfiling, seconds per phase and levelized passes
+        self.profiler: Optional[DeviceProfiler] = None
+        self.phaseTimes: Dict[str, float] = {}
+        self.evaluatePasses = 0
+        self.profileDepth = 0
 
     def getSimulitaionResult(self) -> str:
         return self.getHeader() + "\n" + self.getPinResult()
 
-    def getTruthTable(self) -> str:
-        truthTable = self.getHeader()
+    def getTruthTable(self, mode: TruthTableMode = TruthTableMode.serial,
+                      wordSize: int = 1 << 12,
+                      outputs: Optional[Sequence[int]] = None) -> str:
+        return "\n".join(self.iterTruthTable(mode, wordSize, outputs))
+
+    def iterTruthTable(self, mode: TruthTableMode = TruthTableMode.serial,
+                       wordSize: int = 1 << 12,
+                       outputs: Optional[Sequence[int]] = None) -> Iterator[str]:
+        # yields the header, then one row per input vector, outputs selects
+        # output pins (0 based) and is always simulated per output cone
+        if outputs is not None:
+            self.checkOutputs(outputs)
+            yield self.getHeader(outputs)
+            yield from self.iterConeRows(outputs)
+            return
+        rows = self.iterSimulatedTruthTable(mode, wordSize)
+        if self.truthTableCacheDir is not None and self.lcfHash is not None:
+            rows = self.iterCachedTruthTable(rows)
+        yield from rows
+
+    def iterSimulatedTruthTable(self, mode: TruthTableMode = TruthTableMode.serial,
+                                wordSize: int = 1 << 12) -> Iterator[str]:
+        yield self.getHeader()
+        if mode == TruthTableMode.multiProcess:
+            yield from self.iterMultiProcessRows(wordSize)
+            return
+        if mode == TruthTableMode.bitParallel:
+            yield from self.iterBitParallelRows(wordSize)
+            return
+        if mode == TruthTableMode.compiled:
+            yield from self.iterBitParallelRows(wordSize, compiled=True)
+            return
+        if mode == TruthTableMode.grayCode:
+            yield from self.iterGrayCodeRows()
+            return
+        if mode == TruthTableMode.cone:
+            yield from self.iterConeRows(range(len(self.oPins)))
+            return
+        if mode == TruthTableMode.bdd:
+            bdd, outputs = self.getBdd()
+            yield from bdd.iterRows(outputs)
+            return
         for values in self.generateInputs(len(self.iPins)):
             # init ipin
             for iPin, v in zip(self.iPins, values):
                 iPin.output = v
-            truthTable += "\n" + self.getPinResult()
-        return truthTable
+            yield " ".join(map(str, values)) + " | " + \
+                " ".join(map(str, self.evaluate()))
 
-    def load(self, lcf: str) -> bool:
-        # %% Check format
-        if not self.isLcfFormat(lcf):
-            return False
-        lines = lcf.split("\n")
-        # remove empty line
-        if lines[-1] == "":
-            lines.pop()
-        pinCount = int(lines[0])
-        if not (0 < pinCount <= 16):
+    def iterCachedTruthTable(self, rows: Iterator[str]) -> Iterator[str]:
+        # rows are only consumed (and saved) on a cache miss
+        path = self.truthTableCacheDir.joinpath(f"{self.lcfHash}.txt")
+        if path.exists():
+            self.truthTableCacheHits += 1
+            with open(path, "r") as truthTable:
+                # the header spans three lines
+                yield "".join(truthTable.readline() for _ in range(3))[:-1]
+                for row in truthTable:
+                    yield row.rstrip("\n")
+            return
+        self.truthTableCacheMisses += 1
+        self.truthTableCacheDir.mkdir(parents=True, exist_ok=True)
+        # only a completely written table is moved into the cache
+        partial = path.with_suffix(".part")
+        with open(partial, "w") as truthTable:
+            for row in rows:
+                truthTable.write(row + "\n")
+                yield row
+        partial.replace(path)
+
+    def writeTruthTable(self, file: TextIO,
+                        mode: TruthTableMode = TruthTableMode.serial,
+                        wordSize: int = 1 << 12, chunkRows: int = 1 << 10,
+                        outputs: Optional[Sequence[int]] = None) -> None:
+        rows = self.iterTruthTable(mode, wordSize, outputs)
+        chunk = [next(rows)]
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunkRows:
+                file.write("\n".join(chunk))
+                chunk = [""]  # leading newline for the next chunk
+        file.write("\n".join(chunk))
+
+    def iterMultiProcessRows(self, wordSize: int = 1 << 12) -> Iterator[str]:
+        # contiguous row ranges are simulated bit-parallel in worker
+        # processes, each rebuilding the circuit once from the netlist
+        pinCount = len(self.iPins)
+        workers = self.workers or cpu_count() or 1
+        if self.netlist is None or workers == 1 or \
+                pinCount < self.PARALLEL_MIN_PIN_COUNT:
+            yield from self.iterBitParallelRows(wordSize)
+            return
+        rowCount = 1 << pinCount
+        wordSize = min(wordSize, rowCount)
+        # a few ranges per worker to balance the load, a power of 2 so every
+        # range starts on a word
+        rangeSize = max(wordSize, 1 << max(
+            0, (rowCount // (workers << 2)).bit_length() - 1))
+        with ProcessPoolExecutor(workers, initializer=_initWorker,
+                                 initargs=(self.netlist,)) as executor:
+            starts = range(0, rowCount, rangeSize)
+            for rows in executor.map(_simulateRows, starts,
+                                     [rangeSize] * len(starts),
+                                     [wordSize] * len(starts)):
+                yield from rows.split("\n")
+
+    def iterBitParallelRows(self, wordSize: int = 1 << 12, start: int = 0,
+                            stop: Optional[int] = None,
+                            compiled: bool = False) -> Iterator[str]:
+        # evaluate wordSize input vectors per gate evaluation, start and
+        # stop must be multiples of wordSize
+        assert wordSize > 0 and wordSize & (wordSize - 1) == 0
+        pinCount = len(self.iPins)
+        rowCount = 1 << pinCount
+        wordSize = min(wordSize, rowCount)
+        mask = (1 << wordSize) - 1
+        simulate = self.compileCircuit() if compiled else None
+        values = [iPin.output for iPin in self.iPins]
+        try:
+            for start in range(start, stop or rowCount, wordSize):
+                inputWords = self.getInputWords(start, wordSize)
+                if simulate is not None:
+                    outputs = simulate(*inputWords, mask=mask)
+                else:
+                    for iPin, word in zip(self.iPins, inputWords):
+                        iPin.output = word
+                    outputs = self.evaluate(mask)
+                # column strings, row r of this word at column[r]
+                columns = [format(word, f"0{wordSize}b")[::-1]
+                           for word in outputs]
+                for r in range(wordSize):
+                    yield " ".join(format(start + r, f"0{pinCount}b")) + \
+                        " | " + " ".join(column[r] for column in columns)
+        finally:
+            # restore scalar pin values
+            for iPin, value in zip(self.iPins, values):
+                iPin.output = value
+            self.evaluate()
+
+    def iterSimulateVectors(self, vectors: Iterable[str],
+                            wordSize: int = 1 << 12) -> Iterator[str]:
+        # vectors hold one "0"/"1" per input pin, yields the output values of
+        # each vector, wordSize vectors are evaluated per gate evaluation
+        values = [iPin.output for iPin in self.iPins]
+        batch: List[str] = []
+        try:
+            for vector in vectors:
+                batch.append(vector)
+                if len(batch) == wordSize:
+                    yield from self.simulateBatch(batch)
+                    batch = []
+            if batch:
+                yield from self.simulateBatch(batch)
+        finally:
+            for iPin, value in zip(self.iPins, values):
+                iPin.output = value
+            self.evaluate()
+
+    def simulateBatch(self, batch: List[str]) -> List[str]:
+        # bit r of the word of pin i is pin i of vector r
+        for iPin, column in zip(self.iPins, zip(*batch)):
+            iPin.output = int("".join(reversed(column)), 2)
+        columns = [format(word, f"0{len(batch)}b")[::-1]
+                   for word in self.evaluate((1 << len(batch)) - 1)]
+        return [" ".join(column[r] for column in columns)
+                for r in range(len(batch))]
+
+    def iterConeRows(self, outputs: Sequence[int]) -> Iterator[str]:
+        pinCount = len(self.iPins)
+        columns = [format(word, f"0{1 << pinCount}b")[::-1]
+                   for word in self.getOutputWords(outputs)]
+        for r, values in enumerate(zip(*columns)):
+            yield " ".join(format(r, f"0{pinCount}b")) + " | " + \
+                " ".join(values)
+
+    def getOutputWords(self, outputs: Sequence[int]) -> List[int]:
+        # the column of every output, bit r is truth table row r, outputs
+        # sharing a support are evaluated together, once per vector of their
+        # support pins in one word, each word is then expanded to every row
+        self.checkOutputs(outputs)
+        pinCount = len(self.iPins)
+        netlist = self.netlist
+        words = [0] * len(outputs)
+        groups: Dict[Tuple[int, ...], List[int]] = {}
+        for position, j in enumerate(outputs):
+            groups.setdefault(self.supports[j], []).append(position)
+        for support, positions in groups.items():
+            cone = netlist.extractCone(
+                [outputs[position] for position in positions], support)
+            rowCount = 1 << len(support)
+            values = self.getPinWords(len(support), 0, rowCount) + \
+                [0] * len(cone.gateTypes)
+            cone.evaluate(values, (1 << rowCount) - 1)
+            for position, signal in zip(positions, cone.outputs):
+                words[position] = self.expandWord(
+                    values[signal], support, pinCount)
+        return words
+
+    def checkOutputs(self, outputs: Sequence[int]) -> None:
+        if not outputs or not all(isinstance(j, int) and
+                                  0 <= j < len(self.oPins) for j in outputs):
+            raise ValueError(f"outputs must be output pin indices "
+                             f"0-{len(self.oPins) - 1}")
+
+    def savePackedTruthTable(self, path: Path,
+                             outputs: Optional[Sequence[int]] = None) -> None:
+        # one bit per row and output, as .npy for that suffix, see
+        # PackedTruthTable
+        if outputs is None:
+            outputs = range(len(self.oPins))
+        self.checkOutputs(outputs)
+        with open(path, "wb") as file:
+            PackedTruthTable.write(file, len(self.iPins),
+                                   self.getOutputWords(outputs),
+                                   path.suffix == ".npy", self.lcfHash)
+
+    def iterGrayCodeRows(self) -> Iterator[str]:
+        # walk inputs in Gray-code order so each row flips one pin and only
+        # its fan-out cone is re-evaluated, rows are buffered and yielded in
+        # binary order
+        pinCount = len(self.iPins)
+        values = [iPin.output for iPin in self.iPins]
+        results = [""] * (1 << pinCount)
+        try:
+            self.evaluate()
+            for i in range(pinCount):
+                self.setInputPin(i, 0)
+            previous = 0
+            for n in range(1 << pinCount):
+                gray = n ^ (n >> 1)
+                flipped = (gray ^ previous).bit_length() - 1
+                if flipped >= 0:
+                    self.setInputPin(pinCount - 1 - flipped,
+                                     (gray >> flipped) & 1)
+                results[gray] = " ".join(str(oPin.output)
+                                         for oPin in self.oPins)
+                previous = gray
+        finally:
+            for i, value in enumerate(values):
+                self.setInputPin(i, value)
+        for n, outputs in enumerate(results):
+            yield " ".join(format(n, f"0{pinCount}b")) + " | " + outputs
+
+    def setInputPin(self, index: int, value: int) -> int:
+        # event-driven update, assumes the other input pins were not changed
+        # since the last evaluation, returns the number of re-evaluated devices
+        iPin = self.iPins[index]
+        if iPin.output != value:
+            iPin.output = value
+            if self.compact or not self.settled:
+                self.evaluate()
+                return len(self.circuit)
+            self.dirty.update(iPin.fanouts)
+        return self.settle()
+
+    def settle(self) -> int:
+        # re-evaluates the dirty devices and whatever changes downstream,
+        # returns the number of re-evaluated devices
+        if not self.dirty:
+            return 0
+        if not self.settled:
+            self.evaluate()
+            return len(self.circuit)
+        events: List[Tuple[int, int, Device]] = []
+        scheduled: Set[Device] = set()
+        for device in self.dirty:
+            heappush(events, (device.level, id(device), device))
+            scheduled.add(device)
+        self.dirty.clear()
+        evaluated = 0
+        while events:
+            _, _, device = heappop(events)
+            scheduled.remove(device)
+            previous = device.output
+            evaluated += 1
+            if device.getOutput() == previous:
+                continue  # stable, stop propagating
+            for fanout in device.fanouts:
+                if fanout not in scheduled:
+                    heappush(events, (fanout.level, id(fanout), fanout))
+                    scheduled.add(fanout)
+        return evaluated
+
+    def getInputWords(self, start: int, wordSize: int) -> List[int]:
+        return self.getPinWords(len(self.iPins), start, wordSize)
+
+    @staticmethod
+    def expandWord(word: int, support: Sequence[int], pinCount: int) -> int:
+        # word holds one bit per vector of the support pins, returns the
+        # word of every truth table row, see getPinWords
+        size = 1 << len(support)
+        for i in range(pinCount - 1, -1, -1):
+            if i in support:
+                continue
+            # move block j of the word to block 2j, then copy it to 2j + 1
+            block = 1 << (pinCount - 1 - i)
+            chunk = size >> 1
+            while chunk >= block:
+                mask = _spreadMask(size << 1, chunk)
+                word = (word & mask) | ((word & ~mask) << chunk)
+                chunk >>= 1
+            word |= word << block
+            size <<= 1
+        return word
+
+    @staticmethod
+    def getPinWords(pinCount: int, start: int, wordSize: int) -> List[int]:
+        # bit r of word i is the value of pin i in truth table row start + r,
+        # start must be a multiple of wordSize and wordSize a power of 2
+        mask = (1 << wordSize) - 1
+        words = []
+        for i in range(pinCount):
+            period = 1 << (pinCount - 1 - i)
+            if period >= wordSize:
+                words.append(mask if start & period else 0)
+                continue
+            unit = ((1 << period) - 1) << period
+            words.append(unit * (mask // ((1 << (period << 1)) - 1)))
+        return words
+
+    def compileCircuit(self) -> Callable[..., List[int]]:
+        # generated straight-line function, simulate(*inputs, mask=1)
+        if self.lcfHash in _compiledCircuits:
+            return _compiledCircuits[self.lcfHash]
+        assert self.netlist is not None
+        namespace: Dict[str, Callable[..., List[int]]] = {}
+        exec(compile(self.netlist.toPythonSource(), f"<lcf {self.lcfHash}>",
+                     "exec"), namespace)
+        if self.lcfHash is not None:
+            _compiledCircuits[self.lcfHash] = namespace["simulate"]
+        return namespace["simulate"]
+
+    def getBdd(self) -> Tuple[BDD, List[int]]:
+        # diagram of every output, built on first use
+        if self.bdd is None:
+            assert self.netlist is not None
+            self.bdd = BDD(getVariableOrder(self.netlist))
+            self.bddOutputs = self.bdd.addNetlist(self.netlist)
+        return self.bdd, self.bddOutputs
+
+    def getSatisfyingCounts(self) -> List[int]:
+        # input vectors setting each output pin to 1, without enumerating them
+        bdd, outputs = self.getBdd()
+        return [bdd.getSatisfyingCount(f) for f in outputs]
+
+    @property
+    def netlist(self) -> Optional[Netlist]:
+        # rebuilt from the devices on first use after an edit
+        if self.edited:
+            self.edited = False
+            self.compactNetlist = self.getDeviceNetlist()
+            self.outputSupports = None
+        return self.compactNetlist
+
+    @netlist.setter
+    def netlist(self, netlist: Optional[Netlist]) -> None:
+        self.compactNetlist = netlist
+        self.edited = False
+
+    @property
+    def supports(self) -> List[Tuple[int, ...]]:
+        # input pins of every output, see Netlist.getSupports, found on first
+        # use as wide circuits rarely need them
+        netlist = self.netlist
+        if self.outputSupports is None:
+            assert netlist is not None
+            self.outputSupports = netlist.getSupports()
+        return self.outputSupports
+
+    def getDeviceNetlist(self) -> Netlist:
+        # netlist of the device circuit, gates in evaluation order
+        gateTypes = {GateAND: DeviceType.gateAND.value,
+                     GateOR: DeviceType.gateOR.value,
+                     GateNot: DeviceType.gateNot.value}
+        signals: Dict[Device, int] = {
+            iPin: i for i, iPin in enumerate(self.iPins)}
+        for gate in self.order:
+            signals[gate] = len(signals)
+        gateIds = self.getGateIndex()
+        netlist = Netlist()
+        netlist.pinCount = len(self.iPins)
+        for gate in self.order:
+            netlist.gateTypes.append(gateTypes[type(gate)])
+            netlist.faninIndices.extend(signals[device] for device in gate.iPins)
+            netlist.faninOffsets.append(len(netlist.faninIndices))
+            netlist.gateIds.append(gateIds[gate])
+        netlist.outputs.extend(signals[oPin.iPins[0]] for oPin in self.oPins)
+        return netlist
+
+    def addInputPin(self) -> int:
+        # returns the new pin id, it drives nothing yet
+        self.checkEditable()
+        if len(self.iPins) >= self.maxPinCount:
+            raise ValueError(f"input pin count must be 1-{self.maxPinCount}")
+        self.iPins.append(IPin())
+        self.markEdited()
+        return len(self.iPins)
+
+    def addGate(self, deviceType: DeviceType, fanins: Sequence[int]) -> int:
+        # fan-in as in lcf files, pins as -id and gates as id, returns the new
+        # gate id, the gate becomes an output and its fan-in stops being one
+        self.checkEditable()
+        if len(self.circuit) >= self.maxGateCount:
+            raise ValueError(f"gate count must be 1-{self.maxGateCount}")
+        devices = self.getFaninDevices(deviceType, fanins)
+        gate = DeviceFactory().generateDevice(deviceType)
+        for device in devices:
+            self.removeOutputPin(device)
+            gate.addInputPin(device)
+        gate.level = 1 + max(device.level for device in devices)
+        self.circuit.append(gate)
+        if self.gateIndex is not None:
+            self.gateIndex[gate] = len(self.circuit) - 1
+        insort(self.order, gate, key=attrgetter("level"))
+        if self.profiler is not None:
+            self.profiler.attach(gate)
+        self.addOutputPin(gate)
+        self.dirty.add(gate)
+        self.markEdited()
+        return len(self.circuit)
+
+    def removeGate(self, gateId: int) -> None:
+        # only output gates can be removed, gates they read may become outputs
+        self.checkEditable()
+        gate = self.getFaninDevices(None, [gateId])[0]
+        if not self.isOutputGate(gate):
+            raise ValueError(f"gate {gateId} drives other gates")
+        if len(self.circuit) == 1:
+            raise ValueError("circuit has no output gate")
+        self.removeOutputPin(gate)
+        for device in gate.iPins:
+            device.fanouts.remove(gate)
+        for device in gate.iPins:
+            if not isinstance(device, IPin) and device.fanouts == []:
+                self.addOutputPin(device)
+        self.circuit.remove(gate)
+        # the gates after it move down one id
+        self.gateIndex = None
+        self.removeFromOrder(gate)
+        self.dirty.discard(gate)
+        if self.profiler is not None:
+            self.profiler.detach(gate)
+        self.markEdited()
+
+    def setGateInputs(self, gateId: int, fanins: Sequence[int]) -> None:
+        # rewires the fan-in of a gate, rejects edits that close a cycle
+        self.checkEditable()
+        gate = self.getFaninDevices(None, [gateId])[0]
+        devices = self.getFaninDevices(
+            DeviceType.gateNot if isinstance(gate, GateNot) else None, fanins)
+        # a cycle needs a path from gate to a new fan-in, levels only grow
+        # along a path so it never passes a device above the fan-in levels
+        targets = set(devices)
+        limit = max(device.level for device in devices)
+        stack, seen = [gate], {gate}
+        while stack:
+            device = stack.pop()
+            if device in targets:
+                raise ValueError(f"gate {gateId} would be in a cycle")
+            for fanout in device.fanouts:
+                if fanout not in seen and fanout.level <= limit:
+                    seen.add(fanout)
+                    stack.append(fanout)
+        previous = gate.iPins
+        for device in previous:
+            device.fanouts.remove(gate)
+        gate.iPins = []
+        for device in devices:
+            self.removeOutputPin(device)
+            gate.addInputPin(device)
+        for device in previous:
+            if not isinstance(device, IPin) and device.fanouts == []:
+                self.addOutputPin(device)
+        self.setLevel(gate, 1 + max(device.level for device in devices))
+        self.dirty.add(gate)
+        self.markEdited()
+
+    def checkEditable(self) -> None:
+        if self.compact or not self.circuit:
+            raise ValueError("only a loaded device circuit can be edited")
+
+    def getFaninDevices(self, deviceType: Optional[DeviceType],
+                        fanins: Sequence[int]) -> List[Device]:
+        # devices of lcf style ids, a NOT gate reads exactly one device
+        if not fanins or deviceType == DeviceType.gateNot and len(fanins) != 1:
+            raise ValueError("a NOT gate has 1 input, other gates at least 1")
+        if deviceType is not None and deviceType not in (
+                DeviceType.gateAND, DeviceType.gateOR, DeviceType.gateNot):
+            raise ValueError(f"{deviceType.name} is not a gate")
+        devices = []
+        for i in fanins:
+            if 0 < -i <= len(self.iPins):
+                devices.append(self.iPins[-i - 1])
+            elif 0 < i <= len(self.circuit):
+                devices.append(self.circuit[i - 1])
+            else:
+                raise ValueError(f"no input pin or gate {i}")
+        return devices
+
+    def getGateIndex(self) -> Dict[Device, int]:
+        # kept by addGate, rebuilt after removeGate renumbers the gates
+        if self.gateIndex is None:
+            self.gateIndex = {gate: n for n, gate in enumerate(self.circuit)}
+        return self.gateIndex
+
+    def removeFromOrder(self, gate: Device) -> None:
+        # gate is found among the gates of its level
+        start = bisect_left(self.order, gate.level, key=attrgetter("level"))
+        del self.order[self.order.index(gate, start)]
+
+    def setLevel(self, gate: Device, level: int) -> None:
+        # the fan-out levels grow as needed, only the gates whose level
+        # changes move in the order
+        levels = {gate: level}
+        stack = [gate]
+        while stack:
+            device = stack.pop()
+            for fanout in device.fanouts:
+                if levels.get(fanout, fanout.level) <= levels[device]:
+                    levels[fanout] = levels[device] + 1
+                    stack.append(fanout)
+        gates = [device for device in levels if not isinstance(device, OPin)]
+        for device in gates:
+            self.removeFromOrder(device)
+        for device, value in levels.items():
+            device.level = value
+        for device in gates:
+            insort(self.order, device, key=attrgetter("level"))
+
+    def isOutputGate(self, device: Device) -> bool:
+        return all(isinstance(fanout, OPin) for fanout in device.fanouts)
+
+    def addOutputPin(self, gate: Device) -> None:
+        # output pins stay in gate id order
+        oPin = OPin()
+        oPin.addInputPin(gate)
+        oPin.level = gate.level + 1
+        oPin.output = gate.output
+        gateIds = self.getGateIndex()
+        self.oPins.insert(bisect_left(
+            self.oPins, gateIds[gate],
+            key=lambda oPin: gateIds[oPin.iPins[0]]), oPin)
+
+    def removeOutputPin(self, device: Device) -> None:
+        for oPin in device.fanouts:
+            if isinstance(oPin, OPin):
+                device.fanouts.remove(oPin)
+                gateIds = self.getGateIndex()
+                position = bisect_left(
+                    self.oPins, gateIds[device],
+                    key=lambda oPin: gateIds[oPin.iPins[0]])
+                del self.oPins[self.oPins.index(oPin, position)]
+                return
+
+    def markEdited(self) -> None:
+        # the lcf hash no longer describes the circuit, results are stale
+        self.edited = True
+        self.lcfHash = None
+        self.clearCache()
+        self.bdd, self.bddOutputs = None, []
+
+    def load(self, lcf: Union[str, TextIO]) -> bool:
+        digest = sha256()
+        try:
+            netlist = self.timePhase("parse", self.parseLcf, lcf, digest.update)
+            netlist = self.timePhase("sort", netlist.sortTopologically)
+            self.timePhase("build", self.build, netlist)
+        except LcfFormatError as error:
+            self.error = error
             return False
-        gateCount = int(lines[1])
-        if not (0 < gateCount <= 1000):
+        self.lcfHash = digest.hexdigest()
+        self.resetProfiler()
+        return True
+
+    def optimize(self) -> int:
+        # rebuilds the loaded circuit from an optimized netlist, see
+        # Netlist.optimize, returns how many gates were removed
+        assert self.netlist is not None
+        gateCount = len(self.netlist.gateTypes)
+        self.timePhase("build", self.build,
+                       self.timePhase("optimize", self.netlist.optimize))
+        self.resetProfiler()
+        return gateCount - len(self.netlist.gateTypes)
+
+    def loadPath(self, path: Path) -> bool:
+        # .lcfb files are compiled netlists, anything else is lcf text
+        if path.suffix == ".lcfb":
+            return self.loadBinary(path)
+        try:
+            lcf = open(path, "r")
+        except OSError as error:
+            self.error = error
             return False
-        if gateCount + 2 != len(lines):
+        with lcf:
+            return self.load(lcf)
+
+    def save(self, path: Path) -> None:
+        # compiled binary netlist, see loadBinary
+        assert self.netlist is not None
+        # written beside path and moved over it, path may be the file the
+        # netlist arrays are mapped from
+        partial = path.with_name(path.name + ".part")
+        with open(partial, "wb") as file:
+            self.netlist.writeBinary(file, self.lcfHash)
+        partial.replace(path)
+
+    def loadBinary(self, path: Path) -> bool:
+        # memory-maps a file written by save, the netlist arrays are used in
+        # place
+        try:
+            with open(path, "rb") as file:
+                try:
+                    buffer = mmap(file.fileno(), 0, access=ACCESS_READ)
+                except ValueError:  # empty file
+                    raise LcfFormatError("truncated lcfb header")
+            netlist, lcfHash = self.timePhase(
+                "parse", Netlist.readBinary, buffer)
+            if not (0 < netlist.pinCount <= self.maxPinCount):
+                raise LcfFormatError(
+                    f"input pin count must be 1-{self.maxPinCount}")
+            if not (0 < len(netlist.gateTypes) <= self.maxGateCount):
+                raise LcfFormatError(
+                    f"gate count must be 1-{self.maxGateCount}")
+            self.timePhase("build", self.build, netlist)
+        except (LcfFormatError, OSError) as error:
+            self.error = error
             return False
-        # %%
+        self.lcfHash = lcfHash
+        self.resetProfiler()
+        return True
+
+    def enableProfiling(self) -> None:
+        # counts gate evaluations and times the load and simulate phases,
+        # shadowing methods on the instances so disabled profiling costs
+        # nothing
+        if self.profiler is not None:
+            return
+        self.profiler = DeviceProfiler()
+        self.phaseTimes = dict.fromkeys(
+            ("parse", "sort", "optimize", "build", "simulate"), 0.0)
+        self.evaluatePasses = 0
+        for gate in self.order:
+            self.profiler.attach(gate)
+        evaluate, setInputPin = self.evaluate, self.setInputPin
+
+        def profiledEvaluate(mask: int = 1) -> List[int]:
+            self.evaluatePasses += 1
+            return self.timePhase("simulate", evaluate, mask)
+
+        def profiledSetInputPin(index: int, value: int) -> int:
+            return self.timePhase("simulate", setInputPin, index, value)
+        self.evaluate = profiledEvaluate
+        self.setInputPin = profiledSetInputPin
+
+    def resetProfiler(self) -> None:
+        # counts start over for a newly built circuit
+        if self.profiler is None:
+            return
+        self.profiler = DeviceProfiler()
+        self.evaluatePasses = 0
+        for gate in self.order:
+            self.profiler.attach(gate)
+
+    def disableProfiling(self) -> None:
+        if self.profiler is None:
+            return
+        for gate in self.order:
+            self.profiler.detach(gate)
+        del self.evaluate, self.setInputPin
+        self.profiler = None
+
+    def timePhase(self, phase: str, function: Callable[..., T], *args) -> T:
+        # nested phases are counted once, by the outermost
+        if self.profiler is None or self.profileDepth:
+            return function(*args)
+        self.profileDepth += 1
+        start = perf_counter()
+        try:
+            return function(*args)
+        finally:
+            self.phaseTimes[phase] += perf_counter() - start
+            self.profileDepth -= 1
+
+    def getStatistics(self) -> Dict[str, object]:
+        statistics: Dict[str, object] = {}
+        if self.netlist is not None:
+            levels = self.netlist.getLevels()
+            statistics["depth"] = max(levels)
+            statistics["depthHistogram"] = dict(sorted(Counter(levels).items()))
+            statistics["fanoutHistogram"] = dict(sorted(
+                Counter(self.netlist.getFanoutCounts()).items()))
+        if self.profiler is not None:
+            statistics["phases"] = dict(self.phaseTimes)
+            statistics["evaluatePasses"] = self.evaluatePasses
+            # per gate in file order
+            if self.compact:
+                statistics["evaluations"] = [self.evaluatePasses] * \
+                    len(self.circuit)
+            else:
+                statistics["evaluations"] = [self.profiler.evaluations[gate]
+                                             for gate in self.circuit]
+                statistics["changes"] = [self.profiler.changes[gate]
+                                         for gate in self.circuit]
+        return statistics
+
+    def getStatisticsReport(self, top: int = 5) -> str:
+        statistics = self.getStatistics()
+        lines = []
+        if "depth" in statistics:
+            lines.append(f"Logic depth: {statistics['depth']}")
+            for name in ("depth", "fanout"):
+                histogram = statistics[f"{name}Histogram"]
+                lines.append(f"{name.capitalize()} histogram: " + ", ".join(
+                    f"{key}: {count}" for key, count in histogram.items()))
+        if "phases" in statistics:
+            phases = statistics["phases"]
+            lines.append("Time: " + ", ".join(
+                f"{phase} {seconds * 1e3:.3f} ms"
+                for phase, seconds in phases.items()))
+            evaluations = statistics["evaluations"]
+            lines.append(f"Levelized passes: {statistics['evaluatePasses']}, "
+                         f"gate evaluations: {sum(evaluations)}")
+            busiest = sorted(range(len(evaluations)),
+                             key=lambda i: -evaluations[i])[:top]
+            lines.append("Most evaluated gates: " + ", ".join(
+                f"{i + 1} ({evaluations[i]})" for i in busiest))
+        return "\n".join(lines)
+
+    def tokenizeLcf(self, lcf: Union[str, TextIO],
+                    hashUpdate: Optional[Callable[[bytes], None]] = None
+                    ) -> Iterator[Tuple[int, List[Tuple[int, int]]]]:
+        # single pass over the lines, yields (line number, [(value, column)])
+        # per line: the pin count, the gate count, then one line per gate as
+        # its type followed by its fan-in, pins as -id and gates as id
+        lines = StringIO(lcf) if isinstance(lcf, str) else lcf
+        lineNo = 0
+        for lineNo, line in enumerate(lines, 1):
+            if hashUpdate is not None:
+                hashUpdate(line.encode())
+            if not line.endswith("\n"):
+                line += "\n"  # last line
+            elif lineNo > 2 and len(line) == 1:
+                raise LcfFormatError("empty line", lineNo, 1)
+            if lineNo <= 2:
+                if not self.isDecimal(line[:-1]):
+                    raise LcfFormatError("expected a count", lineNo, 1)
+                yield lineNo, [(int(line[:-1]), 1)]
+                continue
+            tokens = line[:-1].split(" ")
+            if tokens[0] not in ("1", "2", "3"):
+                raise LcfFormatError("expected gate type 1-3", lineNo, 1)
+            if len(tokens) < 3:
+                raise LcfFormatError("expected a fan-in device",
+                                     lineNo, len(line))
+            if tokens[-1] != "0":
+                raise LcfFormatError("expected 0 at end of line", lineNo,
+                                     len(line) - len(tokens[-1]))
+            devices = [(int(tokens[0]), 1)]
+            column = 3
+            for token in tokens[1:-1]:
+                if token[:1] == "-" and self.isDecimal(token[1:]):  # pin
+                    devices.append((-int(token[1:]), column))
+                else:  # gate
+                    gateID, dot, pinID = token.partition(".")
+                    if not (dot and self.isDecimal(gateID) and
+                            self.isDecimal(pinID)):
+                        raise LcfFormatError(
+                            f"invalid device '{token}'", lineNo, column)
+                    devices.append((int(gateID), column))
+                column += len(token) + 1
+            yield lineNo, devices
+        if lineNo < 3:
+            raise LcfFormatError("unexpected end of file", lineNo + 1, 1)
+
+    def isDecimal(self, token: str) -> bool:
+        return token.isascii() and token.isdecimal()
+
+    def parseLcf(self, lcf: Union[str, TextIO],
+                 hashUpdate: Optional[Callable[[bytes], None]] = None) -> "Netlist":
+        # netlist in file order
+        netlist = Netlist()
+        tokens = self.tokenizeLcf(lcf, hashUpdate)
+        pinCount = gateCount = 0
+        for lineNo, devices in tokens:
+            if lineNo == 1:
+                pinCount = devices[0][0]
+                if not (0 < pinCount <= self.maxPinCount):
+                    raise LcfFormatError(
+                        f"input pin count must be 1-{self.maxPinCount}",
+                        lineNo, 1)
+                netlist.pinCount = pinCount
+                continue
+            if lineNo == 2:
+                gateCount = devices[0][0]
+                if not (0 < gateCount <= self.maxGateCount):
+                    raise LcfFormatError(
+                        f"gate count must be 1-{self.maxGateCount}", lineNo, 1)
+                continue
+            if lineNo > gateCount + 2:
+                raise LcfFormatError(
+                    f"more than {gateCount} gates", lineNo, 1)
+            netlist.gateTypes.append(devices[0][0])
+            for deviceID, column in devices[1:]:
+                if deviceID < 0 and -deviceID <= pinCount:  # pin
+                    netlist.faninIndices.append(-deviceID - 1)
+                elif 0 < deviceID <= gateCount:  # gate
+                    netlist.faninIndices.append(pinCount + deviceID - 1)
+                else:
+                    raise LcfFormatError(
+                        "device id out of range", lineNo, column)
+            netlist.faninOffsets.append(len(netlist.faninIndices))
+        if len(netlist.gateTypes) != gateCount:
+            raise LcfFormatError(f"expected {gateCount} gates",
+                                 len(netlist.gateTypes) + 3, 1)
+        netlist.gateIds.extend(range(gateCount))
+        return netlist
+
+    def build(self, netlist: "Netlist") -> None:
+        # netlist must be in topological order
+        self.netlist = netlist
+        self.circuit, self.iPins, self.oPins, self.order = [], [], [], []
+        self.clearCache()
+        self.outputSupports = None
+        self.bdd, self.bddOutputs = None, []
+        pinCount = netlist.pinCount
+        if self.compact:
+            self.values = [0] * (pinCount + len(netlist.gateTypes))
+            self.iPins = [SignalView(self.values, i) for i in range(pinCount)]
+            self.oPins = [SignalView(self.values, i) for i in netlist.outputs]
+            self.circuit = GateViews(netlist, self.values)
+            self.evaluate()
+            return
         # init ipins
         for _ in range(pinCount):
             self.iPins.append(IPin())
         deviceFactory = DeviceFactory()
-        gatesInfos = [lines[2 + i].split(" ") for i in range(gateCount)]
-        # for determining output gate
-        gateHasOGates = [False]*gateCount
-        # init circuit
-        for info in gatesInfos:
-            gateType = DeviceType(int(info[0]))
-            self.circuit.append(deviceFactory.generateDevice(gateType))
+        # init circuit in file order
+        gateTypes = bytearray(len(netlist.gateTypes))
+        for gateType, gateId in zip(netlist.gateTypes, netlist.gateIds):
+            gateTypes[gateId] = gateType
+        self.circuit = [deviceFactory.generateDevice(DeviceType(gateType))
+                        for gateType in gateTypes]
+        self.order = [self.circuit[gateId] for gateId in netlist.gateIds]
+        # signal index to device
+        devices = self.iPins + self.order
         # construct circuit
-        for gate, info in zip(self.circuit, gatesInfos):
-            for device in info[1:-1]:
-                if device[0] == "-":  # pin
-                    deviceID = int(device[1:])
-                    if not (0 < deviceID <= len(self.iPins)):
-                        return False
-                    gate.addInputPin(self.iPins[deviceID-1])
-                else:  # gate
-                    deviceID = int(device[:device.find(".")])
-                    if not (0 < deviceID <= len(self.circuit)):
-                        return False
-                    gateHasOGates[deviceID-1] = True
-                    gate.addInputPin(self.circuit[deviceID-1])
-        oGateIdxes = [i for (i, hasOGates) in enumerate(
-            gateHasOGates) if not hasOGates]
-        if len(oGateIdxes) == 0:
-            return False
+        for position, gate in enumerate(self.order):
+            for i in range(netlist.faninOffsets[position],
+                           netlist.faninOffsets[position + 1]):
+                gate.addInputPin(devices[netlist.faninIndices[i]])
         # init opins
-        for i in oGateIdxes:
-            gateToOPin = self.circuit[i]
+        for i in netlist.outputs:
             self.oPins.append(OPin())
-            self.oPins[-1].addInputPin(gateToOPin)
-        return True
+            self.oPins[-1].addInputPin(devices[i])
+        # levelize
+        for device in self.order + self.oPins:
+            device.level = 1 + max(fanin.level for fanin in device.iPins)
+        self.order.sort(key=attrgetter("level"))
+        self.gateIndex = None
+        # settle outputs for event-driven updates
+        self.evaluate()
 
-    def isLcfFormat(self, lcf: str) -> bool:
-        return fullmatch(self.LCF_FORMAT, lcf) != None
+    def isLcfFormat(self, lcf: Union[str, TextIO]) -> bool:
+        try:
+            for _ in self.tokenizeLcf(lcf):
+                pass
+        except LcfFormatError:
+            return False
+        return True
 
-    def generateInputs(self, count: int) -> List[List[int]]:
+    def generateInputs(self, count: int) -> Iterator[List[int]]:
         assert count > 0
-        preInputs: List[List[int]] = [[]]
-        nextInputs: List[List[int]] = []
-        while count > 0:
-            for inputs in preInputs:
-                nextInputs.append([0] + inputs)
-            for inputs in preInputs:
-                nextInputs.append([1] + inputs)
-            preInputs = nextInputs
-            nextInputs = []
-            count -= 1
-        return preInputs
+        for n in range(1 << count):
+            yield [(n >> i) & 1 for i in range(count - 1, -1, -1)]
 
     def getPinResult(self) -> str:
         iPins = (str(iPin.getOutput()) for iPin in self.iPins)
         oPins = map(str, self.getSimulateOutput())
         return " ".join(iPins) + " | " + " ".join(oPins)
 
-    def getSimulateOutput(self) -> List[int]:
-        return [oPin.getOutput() for oPin in self.oPins]
+    def getSimulateOutput(self, mask: int = 1) -> List[int]:
+        # scalar results are cached by input bitmask
+        if mask != 1 or self.cacheSize <= 0:
+            return self.evaluate(mask)
+        key = 0
+        for iPin in self.iPins:
+            key = key << 1 | iPin.output
+        outputs = self.cache.get(key)
+        if outputs is not None:
+            self.cacheHits += 1
+            self.cache.move_to_end(key)
+            self.settled = False
+            return list(outputs)
+        self.cacheMisses += 1
+        outputs = self.evaluate()
+        self.cache[key] = outputs
+        if len(self.cache) > self.cacheSize:
+            self.cache.popitem(last=False)
+        return list(outputs)
 
-    def getHeader(self) -> str:
-        iPinCount = len(self.iPins)
-        oPinCount = len(self.oPins)
-        header = f"{'i ' * iPinCount}|{' o' * oPinCount}\n"
-        iPinIDs = map(str, range(1, iPinCount+1))
-        oPinIDs = map(str, range(1, oPinCount+1))
-        header += " ".join(iPinIDs) + " | " + " ".join(oPinIDs) + "\n"\
-            f"{'-' * (iPinCount << 1)}+{'-' * (oPinCount << 1)}"
-        return header
+    def clearCache(self) -> None:
+        self.cache.clear()
+        self.cacheHits = self.cacheMisses = 0
+
+    def evaluate(self, mask: int = 1) -> List[int]:
+        # one levelized pass over the circuit
+        self.settled = mask == 1
+        self.dirty.clear()
+        if self.compact:
+            self.netlist.evaluate(self.values, mask)
+            return [oPin.output for oPin in self.oPins]
+        for gate in self.order:
+            gate.getOutput(mask)
+        return [oPin.getOutput(mask) for oPin in self.oPins]
+
+    def getHeader(self, outputs: Optional[Sequence[int]] = None) -> str:
+        if outputs is None:
+            outputs = range(len(self.oPins))
+        return formatHeader(len(self.iPins), outputs)
@@ -1,12 +1,27 @@
+from argparse import ArgumentParser
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from io import StringIO
+import json
 from pathlib import Path
+from operator import add, mul
+import pickle
 import sys
+from tempfile import TemporaryDirectory
+from typing import Callable, List
 import unittest
 from unittest.mock import patch
 
-from textUI import Command, TextUI
-from logicSimulator import LogicSimulator
-from device import GateAND, GateNot, GateOR, IPin, OPin
+from bdd import BDD, getVariableOrder
+from equivalence import EquivalenceChecker
+from faultSimulator import FaultSimulator
+from monteCarlo import MonteCarloSimulator
+from server import SimulationServer, generateLoad, request
+from textUI import BatchUI, Command, TextUI
+from logicSimulator import LogicSimulator, PackedTruthTable, TruthTableMode
+from device import DeviceType, GateAND, GateNot, GateOR, IPin, OPin
+from benchmark import (adderLcf, compareResults, fanoutTreeLcf,
+                       multiplierLcf, notChainLcf, randomLcf)
 
 _PATH = Path(__file__).parent.resolve()
 
@@ -190,6 +205,162 @@ class TestLogicSimulator(unittest.TestCase):
             "2 2.1 -3 0"
         with self.subTest(msg="igateid too big"):
             self.assertFalse(LogicSimulator().load(lcf))
+        lcf = "2\n"\
+            "3\n"\
+            "1 -1 2.1 0\n"\
+            "2 1.1 -2 0\n"\
+            "3 2.1 0"
+        with self.subTest(msg="cycle"):
+            self.assertFalse(LogicSimulator().load(lcf))
+
+    def testLoadError(self):
+        lcfs = [("3\n"
+                 "3\n"
+                 "1 -1 2.1 3.1 0\n"
+                 "3 -2 0\n"
+                 "2 2.1 x 0", (5, 7)),
+                ("3\n"
+                 "1001\n"
+                 "1 -1 0\n", (2, 1)),
+                ("3\n"
+                 "1\n"
+                 "1 -1 4.1 0\n", (3, 6)),
+                ("3\n"
+                 "1\n"
+                 "1 -1 -2\n", (3, 6)),
+                ("3\n"
+                 "2\n"
+                 "1 -1 0\n"
+                 "\n", (4, 1))]
+        for lcf, position in lcfs:
+            logicSimulator = LogicSimulator()
+            with self.subTest(msg=repr(lcf)):
+                self.assertFalse(logicSimulator.load(lcf))
+                self.assertEqual(
+                    (logicSimulator.error.line, logicSimulator.error.column),
+                    position)
+
+    def testLoadFile(self):
+        with open(_PATH.joinpath("file1.lcf"), "r") as lcf:
+            self.assertTrue(self.logicSimulator.load(lcf))
+        self.assertEqual(len(self.logicSimulator.circuit), 3)
+
+    def testOrder(self):
+        lcf = "3\n"\
+            "3\n"\
+            "1 -1 2.1 3.1 0\n"\
+            "3 -2 0\n"\
+            "2 2.1 -3 0"
+        self.assertTrue(self.logicSimulator.load(lcf))
+        circuit = self.logicSimulator.circuit
+        self.assertEqual(self.logicSimulator.order,
+                         [circuit[1], circuit[2], circuit[0]])
+
+    def testLongChain(self):
+        self.assertTrue(self.logicSimulator.load(notChainLcf(1000)))
+        for i in range(2):
+            self.logicSimulator.iPins[0].output = i
+            self.assertEqual(self.logicSimulator.getSimulateOutput(), [i])
+
+    def testLimits(self):
+        lcf = randomLcf(17, 1001)
+        with self.subTest(msg="default limits"):
+            self.assertFalse(LogicSimulator().load(lcf))
+        with self.subTest(msg="raised limits"):
+            self.assertTrue(LogicSimulator(17, 1001).load(lcf))
+
+    def testCompact(self):
+        lcf = randomLcf(6, 40, seed=6)
+        self.assertTrue(self.logicSimulator.load(lcf))
+        compact = LogicSimulator(compact=True)
+        self.assertTrue(compact.load(lcf))
+        self.assertEqual(len(compact.circuit), 40)
+        for mode in TruthTableMode:
+            with self.subTest(msg=f"mode: {mode.name}"):
+                self.assertEqual(compact.getTruthTable(mode),
+                                 self.logicSimulator.getTruthTable())
+        with self.subTest(msg="gate views"):
+            for gate, view in zip(self.logicSimulator.circuit, compact.circuit):
+                self.assertEqual(gate.output, view.output)
+
+    def testCompactLargeCircuit(self):
+        logicSimulator = LogicSimulator(maxGateCount=100000, compact=True)
+        self.assertTrue(logicSimulator.load(notChainLcf(100000)))
+        logicSimulator.iPins[0].output = 1
+        self.assertEqual(logicSimulator.getSimulateOutput(), [1])
+
+    def testCache(self):
+        logicSimulator = LogicSimulator(cacheSize=2)
+        self.assertTrue(logicSimulator.load(randomLcf(3, 10)))
+        logicSimulator.clearCache()
+        expected = []
+        for values in logicSimulator.generateInputs(3):
+            for iPin, v in zip(logicSimulator.iPins, values):
+                iPin.output = v
+            expected.append(logicSimulator.getSimulateOutput())
+        with self.subTest(msg="miss"):
+            self.assertEqual((logicSimulator.cacheHits,
+                              logicSimulator.cacheMisses), (0, 8))
+            self.assertEqual(len(logicSimulator.cache), 2)
+        with self.subTest(msg="hit"):
+            for iPin in logicSimulator.iPins:
+                iPin.output = 1
+            self.assertEqual(logicSimulator.getSimulateOutput(), expected[7])
+            self.assertEqual(logicSimulator.cacheHits, 1)
+        with self.subTest(msg="event-driven after hit"):
+            logicSimulator.setInputPin(0, 0)
+            self.assertEqual(logicSimulator.evaluate(), expected[3])
+        with self.subTest(msg="invalidate on load"):
+            self.assertTrue(logicSimulator.load(randomLcf(3, 10, seed=1)))
+            self.assertEqual(len(logicSimulator.cache), 0)
+            self.assertEqual(len(logicSimulator.iPins), 3)
+
+    def testTruthTableCache(self):
+        lcf = randomLcf(4, 20)
+        expected = LogicSimulator()
+        self.assertTrue(expected.load(lcf))
+        with TemporaryDirectory() as cacheDir:
+            for i in range(2):
+                logicSimulator = LogicSimulator(
+                    truthTableCacheDir=Path(cacheDir))
+                with open(Path(cacheDir).joinpath("lcf"), "w") as lcfFile:
+                    lcfFile.write(lcf)
+                with open(Path(cacheDir).joinpath("lcf"), "r") as lcfFile:
+                    self.assertTrue(logicSimulator.load(lcfFile))
+                with self.subTest(msg=f"load {i}"):
+                    self.assertEqual(logicSimulator.getTruthTable(),
+                                     expected.getTruthTable())
+                    self.assertEqual((logicSimulator.truthTableCacheHits,
+                                      logicSimulator.truthTableCacheMisses),
+                                     (i, 1 - i))
+
+    def testProfiling(self):
+        self.logicSimulator.enableProfiling()
+        with open(_PATH.joinpath("file1.lcf"), "r") as lcf:
+            self.assertTrue(self.logicSimulator.load(lcf))
+        with self.subTest(msg="structure"):
+            statistics = self.logicSimulator.getStatistics()
+            self.assertEqual(statistics["depth"], 3)
+            self.assertEqual(statistics["depthHistogram"], {1: 1, 2: 1, 3: 1})
+            self.assertEqual(statistics["fanoutHistogram"], {0: 1, 1: 1, 2: 1})
+        with self.subTest(msg="levelized"):
+            self.logicSimulator.evaluate()
+            self.logicSimulator.evaluate()
+            statistics = self.logicSimulator.getStatistics()
+            self.assertEqual(statistics["evaluatePasses"], 2)
+            self.assertEqual(statistics["evaluations"], [2, 2, 2])
+        with self.subTest(msg="event-driven"):
+            self.logicSimulator.setInputPin(0, 1)
+            statistics = self.logicSimulator.getStatistics()
+            self.assertEqual(statistics["evaluations"], [3, 2, 2])
+            self.assertEqual(statistics["changes"], [1, 0, 0])
+            self.assertGreater(statistics["phases"]["simulate"], 0)
+        with self.subTest(msg="disabled"):
+            self.logicSimulator.disableProfiling()
+            self.assertNotIn("phases", self.logicSimulator.getStatistics())
+            for gate in self.logicSimulator.circuit:
+                self.assertNotIn("getOutput", vars(gate))
+            self.assertNotIn("evaluate", vars(self.logicSimulator))
 
     def testGetHeader(self):
         self.logicSimulator.iPins = [IPin()]*3
@@ -213,6 +384,386 @@ class TestLogicSimulator(unittest.TestCase):
             "1 1 | 1 1"
         self.assertEqual(self.logicSimulator.getTruthTable(), result)
 
+    def testBitParallelTruthTable(self):
+        for pinCount, gateCount in [(1, 3), (3, 10), (8, 60)]:
+            lcf = randomLcf(pinCount, gateCount, seed=gateCount)
+            serial, bitParallel = LogicSimulator(), LogicSimulator()
+            self.assertTrue(serial.load(lcf) and bitParallel.load(lcf))
+            for wordSize in [1, 4, 1 << 12]:
+                with self.subTest(msg=f"{pinCount} pins, word size {wordSize}"):
+                    self.assertEqual(
+                        bitParallel.getTruthTable(
+                            TruthTableMode.bitParallel, wordSize),
+                        serial.getTruthTable())
+
+    def testGrayCodeTruthTable(self):
+        for pinCount, gateCount in [(1, 3), (3, 10), (8, 60)]:
+            lcf = randomLcf(pinCount, gateCount, seed=gateCount)
+            serial, grayCode = LogicSimulator(), LogicSimulator()
+            self.assertTrue(serial.load(lcf) and grayCode.load(lcf))
+            with self.subTest(msg=f"{pinCount} pins"):
+                self.assertEqual(
+                    grayCode.getTruthTable(TruthTableMode.grayCode),
+                    serial.getTruthTable())
+
+    def testMultiProcessTruthTable(self):
+        lcf = randomLcf(6, 40, seed=3)
+        self.assertTrue(self.logicSimulator.load(lcf))
+        logicSimulator = LogicSimulator(workers=2)
+        self.assertTrue(logicSimulator.load(lcf))
+        logicSimulator.PARALLEL_MIN_PIN_COUNT = 1
+        self.assertEqual(
+            logicSimulator.getTruthTable(TruthTableMode.multiProcess, 4),
+            self.logicSimulator.getTruthTable())
+
+    def testMultiProcessOddWorkers(self):
+        # 1 << 16 rows over 12 ranges are not a whole number of words
+        lcf = randomLcf(16, 60, seed=8)
+        self.assertTrue(self.logicSimulator.load(lcf))
+        logicSimulator = LogicSimulator(workers=3)
+        self.assertTrue(logicSimulator.load(lcf))
+        self.assertEqual(
+            logicSimulator.getTruthTable(TruthTableMode.multiProcess, 1 << 10),
+            self.logicSimulator.getTruthTable(TruthTableMode.bitParallel))
+
+    def testCompileCircuit(self):
+        self.assertTrue(self.logicSimulator.load(randomLcf(4, 30, seed=4)))
+        simulate = self.logicSimulator.compileCircuit()
+        with self.subTest(msg="0/1 values"):
+            for values in self.logicSimulator.generateInputs(4):
+                for iPin, v in zip(self.logicSimulator.iPins, values):
+                    iPin.output = v
+                self.assertEqual(simulate(*values),
+                                 self.logicSimulator.getSimulateOutput())
+        with self.subTest(msg="cached by lcf hash"):
+            logicSimulator = LogicSimulator()
+            self.assertTrue(logicSimulator.load(randomLcf(4, 30, seed=4)))
+            self.assertIs(logicSimulator.compileCircuit(), simulate)
+        with self.subTest(msg="bit-packed words"):
+            self.assertEqual(
+                self.logicSimulator.getTruthTable(TruthTableMode.compiled, 4),
+                self.logicSimulator.getTruthTable())
+        with self.subTest(msg="wide fan-in"):
+            self.assertTrue(self.logicSimulator.load(
+                "2\n2\n1 " + "-1 -2 " * 2000 + "0\n2 " + "-2 " * 3000 + "0\n"))
+            self.assertEqual(
+                self.logicSimulator.getTruthTable(TruthTableMode.compiled),
+                self.logicSimulator.getTruthTable())
+
+    def testSetInputPin(self):
+        lcf = "3\n"\
+            "3\n"\
+            "1 -1 2.1 3.1 0\n"\
+            "3 -2 0\n"\
+            "2 2.1 -3 0"
+        self.assertTrue(self.logicSimulator.load(lcf))
+        oPin = self.logicSimulator.oPins[0]
+        with self.subTest(msg="unchanged pin"):
+            self.assertEqual(self.logicSimulator.setInputPin(0, 0), 0)
+        with self.subTest(msg="propagate to output"):
+            self.assertEqual(self.logicSimulator.setInputPin(0, 1), 2)
+            self.assertEqual(oPin.output, 1)
+        with self.subTest(msg="stop at stable gate"):
+            # NOT -2 changes, OR stays 1 and AND is not re-evaluated
+            self.assertEqual(self.logicSimulator.setInputPin(2, 1), 1)
+            self.assertEqual(oPin.output, 1)
+            self.assertEqual(self.logicSimulator.setInputPin(1, 1), 4)
+            self.assertEqual(oPin.output, 0)
+
+    def testWriteTruthTable(self):
+        self.assertTrue(self.logicSimulator.load(randomLcf(5, 20)))
+        expected = self.logicSimulator.getTruthTable()
+        for mode in TruthTableMode:
+            for chunkRows in [1, 3, 1 << 10]:
+                with self.subTest(msg=f"mode: {mode.name}, chunk rows: {chunkRows}"):
+                    file = StringIO()
+                    self.logicSimulator.writeTruthTable(
+                        file, mode, 8, chunkRows)
+                    self.assertEqual(file.getvalue(), expected)
+
+    def testBinaryNetlist(self):
+        lcf = randomLcf(6, 40, seed=7)
+        self.assertTrue(self.logicSimulator.load(lcf))
+        expected = self.logicSimulator.getTruthTable()
+        with TemporaryDirectory() as directory:
+            path = Path(directory, "circuit.lcfb")
+            self.logicSimulator.save(path)
+            for compact in [False, True]:
+                with self.subTest(msg=f"compact: {compact}"):
+                    logicSimulator = LogicSimulator(compact=compact)
+                    self.assertTrue(logicSimulator.loadPath(path))
+                    self.assertEqual(logicSimulator.lcfHash,
+                                     self.logicSimulator.lcfHash)
+                    self.assertEqual(logicSimulator.getTruthTable(), expected)
+            with self.subTest(msg="pickled for worker processes"):
+                logicSimulator = LogicSimulator(compact=True)
+                self.assertTrue(logicSimulator.loadPath(path))
+                self.assertEqual(
+                    pickle.loads(pickle.dumps(logicSimulator.netlist)).toLcf(),
+                    logicSimulator.netlist.toLcf())
+            with self.subTest(msg="saved over its own file"):
+                logicSimulator = LogicSimulator(compact=True)
+                self.assertTrue(logicSimulator.loadPath(path))
+                logicSimulator.save(path)
+                self.assertEqual(logicSimulator.getTruthTable(), expected)
+                self.assertTrue(LogicSimulator().loadPath(path))
+            with self.subTest(msg="lcf round trip"):
+                logicSimulator = LogicSimulator()
+                self.assertTrue(logicSimulator.load(
+                    self.logicSimulator.netlist.toLcf()))
+                self.assertEqual(logicSimulator.getTruthTable(), expected)
+            data = path.read_bytes()
+            for name, corrupted in [
+                    ("empty", b""),
+                    ("magic", b"LCFX" + data[4:]),
+                    ("version", data[:4] + b"\x09" + data[5:]),
+                    ("truncated", data[:-4]),
+                    ("gate type", data[:64] + b"\x07" + data[65:]),
+                    ("cycle", data[:-4 * (len(data) // 4 - 20)] +
+                     b"\xff" * 4 * (len(data) // 4 - 20))]:
+                with self.subTest(msg=f"corrupted: {name}"):
+                    path.write_bytes(corrupted)
+                    logicSimulator = LogicSimulator()
+                    self.assertFalse(logicSimulator.loadPath(path))
+                    self.assertIsInstance(logicSimulator.error, ValueError)
+            with self.subTest(msg="limits"):
+                self.logicSimulator.save(path)
+                self.assertFalse(LogicSimulator(maxPinCount=4).loadPath(path))
+            for name in ["missing.lcfb", "missing.lcf"]:
+                with self.subTest(msg=name):
+                    logicSimulator = LogicSimulator()
+                    self.assertFalse(logicSimulator.loadPath(
+                        Path(directory, name)))
+                    self.assertIsInstance(logicSimulator.error,
+                                          FileNotFoundError)
+
+    def testOutputCones(self):
+        lcf = randomLcf(8, 50, seed=3)
+        for compact in [False, True]:
+            logicSimulator = LogicSimulator(compact=compact)
+            self.assertTrue(logicSimulator.load(lcf))
+            expected = logicSimulator.getTruthTable().split("\n")
+            self.assertEqual(
+                logicSimulator.getTruthTable(TruthTableMode.cone),
+                "\n".join(expected))
+            for outputs in [[0], [2, 0], list(range(len(logicSimulator.oPins)))]:
+                with self.subTest(msg=f"compact: {compact}, outputs: {outputs}"):
+                    rows = logicSimulator.getTruthTable(
+                        outputs=outputs).split("\n")
+                    self.assertEqual(rows[1].split(" | ")[1],
+                                     " ".join(str(j + 1) for j in outputs))
+                    for row, expectedRow in zip(rows[3:], expected[3:]):
+                        inputs, values = expectedRow.split(" | ")
+                        values = values.split(" ")
+                        self.assertEqual(row, inputs + " | " + " ".join(
+                            values[j] for j in outputs))
+        self.assertTrue(self.logicSimulator.load(adderLcf(2)))
+        # found on first use, not by every load
+        self.assertIsNone(self.logicSimulator.outputSupports)
+        # the low sum bit is a 4-gate xor of the low operand bits
+        self.assertEqual(self.logicSimulator.supports[0], (0, 2))
+        self.assertEqual(len(self.logicSimulator.netlist.extractCone(
+            [0], self.logicSimulator.supports[0]).gateTypes), 4)
+        for outputs in [[], [-1], [3]]:
+            with self.subTest(msg=f"outputs: {outputs}"):
+                with self.assertRaises(ValueError):
+                    self.logicSimulator.getTruthTable(outputs=outputs)
+                with self.assertRaises(ValueError):
+                    self.logicSimulator.getOutputWords(outputs)
+
+    def testPackedTruthTable(self):
+        for pinCount in [2, 7]:
+            self.assertTrue(self.logicSimulator.load(randomLcf(pinCount, 30)))
+            expected = self.logicSimulator.getTruthTable()
+            rows = [row.split(" | ")[1].split(" ")
+                    for row in expected.split("\n")[3:]]
+            with TemporaryDirectory() as directory:
+                for suffix in [".lcft", ".npy"]:
+                    with self.subTest(msg=f"pins: {pinCount}, {suffix}"):
+                        path = Path(directory, "table" + suffix)
+                        self.logicSimulator.savePackedTruthTable(path)
+                        with PackedTruthTable(path, pinCount) as table:
+                            self.assertEqual(len(table), 1 << pinCount)
+                            self.assertEqual("\n".join(table.iterText(8)),
+                                             expected)
+                            for i in [0, 1, len(rows) - 1]:
+                                self.assertEqual(table.row(i),
+                                                 list(map(int, rows[i])))
+                            with table.column(1) as column:
+                                self.assertEqual(
+                                    int.from_bytes(column, "little"),
+                                    sum(int(row[1]) << i
+                                        for i, row in enumerate(rows)))
+                            with self.assertRaises(IndexError):
+                                table.row(len(rows))
+                        self.assertTrue(table.buffer.closed)
+                with self.subTest(msg="npy header"):
+                    data = Path(directory, "table.npy").read_bytes()
+                    self.assertEqual(len(data[:data.index(b"\n") + 1]) % 64, 0)
+                    self.assertIn(b"'shape': (", data)
+                    with PackedTruthTable(
+                            Path(directory, "table.lcft")) as table:
+                        self.assertEqual(table.lcfHash,
+                                         self.logicSimulator.lcfHash)
+                    if pinCount <= 3:
+                        # one byte columns fit 1 to 3 pins
+                        with self.assertRaises(ValueError):
+                            PackedTruthTable(Path(directory, "table.npy"))
+                    else:
+                        with PackedTruthTable(
+                                Path(directory, "table.npy")) as table:
+                            self.assertEqual(table.pinCount, pinCount)
+                with self.subTest(msg="subset"):
+                    path = Path(directory, "table.lcft")
+                    self.logicSimulator.savePackedTruthTable(path, [2])
+                    with PackedTruthTable(path) as table:
+                        self.assertEqual(table.row(3), [int(rows[3][2])])
+                with self.subTest(msg="corrupted"):
+                    path.write_bytes(path.read_bytes()[:-1])
+                    with self.assertRaises(ValueError):
+                        PackedTruthTable(path)
+                    path = Path(directory, "table.npy")
+                    for data in [b"\x93NUMPY", b"\x93NUMPY\x01\x00\x40",
+                                 b"\x93NUMPY\x01\x00\x40\x00{'descr'"]:
+                        path.write_bytes(data)
+                        with self.assertRaises(ValueError):
+                            PackedTruthTable(path)
+
+    def testEditCircuit(self):
+        self.assertTrue(self.logicSimulator.load(randomLcf(4, 12, seed=1)))
+        gateCount = len(self.logicSimulator.circuit)
+        outputs = len(self.logicSimulator.oPins)
+        # a new gate reading an output gate takes over its output pin
+        output = self.logicSimulator.netlist.gateIds[
+            self.logicSimulator.netlist.outputs[0] - 4] + 1
+        gate = self.logicSimulator.addGate(DeviceType.gateNot, [output])
+        self.assertEqual(gate, gateCount + 1)
+        self.assertEqual(len(self.logicSimulator.oPins), outputs)
+        pin = self.logicSimulator.addInputPin()
+        self.assertEqual(pin, 5)
+        self.logicSimulator.setGateInputs(gate, [-pin])
+        self.assertEqual(len(self.logicSimulator.oPins), outputs + 1)
+        self.logicSimulator.setGateInputs(1, [gate, -2])
+        self.logicSimulator.removeGate(
+            self.logicSimulator.addGate(DeviceType.gateOR, [-1, -5]))
+        for message, edit in [
+                ("cycle", lambda: self.logicSimulator.setGateInputs(gate, [1])),
+                ("self loop", lambda: self.logicSimulator.setGateInputs(1, [1])),
+                ("drives gates", lambda: self.logicSimulator.removeGate(gate)),
+                ("not arity", lambda: self.logicSimulator.addGate(
+                    DeviceType.gateNot, [-1, -2])),
+                ("unknown gate", lambda: self.logicSimulator.addGate(
+                    DeviceType.gateAND, [99])),
+                ("pin type", lambda: self.logicSimulator.addGate(
+                    DeviceType.iPin, [-1]))]:
+            with self.subTest(msg=message):
+                with self.assertRaises(ValueError):
+                    edit()
+        # the edited circuit matches the same circuit loaded from lcf text
+        expected = LogicSimulator()
+        self.assertTrue(expected.load(self.logicSimulator.netlist.toLcf()))
+        self.assertIsNone(self.logicSimulator.lcfHash)
+        for mode in TruthTableMode:
+            with self.subTest(msg=f"mode: {mode.name}"):
+                self.assertEqual(self.logicSimulator.getTruthTable(mode),
+                                 expected.getTruthTable())
+        with self.subTest(msg="compact"):
+            with self.assertRaises(ValueError):
+                LogicSimulator(compact=True).addInputPin()
+
+    def testEditCones(self):
+        # cone rows right after every edit, no netlist read in between
+        self.assertTrue(self.logicSimulator.load(randomLcf(4, 12, seed=1)))
+        pin = self.logicSimulator.addInputPin()
+        gate = self.logicSimulator.addGate(DeviceType.gateAND, [-1, -pin])
+        for edit in [lambda: self.logicSimulator.addGate(
+                         DeviceType.gateNot, [gate]),
+                     lambda: self.logicSimulator.setGateInputs(1, [-pin]),
+                     lambda: self.logicSimulator.setGateInputs(gate, [-2, 1]),
+                     lambda: self.logicSimulator.removeGate(
+                         len(self.logicSimulator.circuit))]:
+            edit()
+            # the order stays sorted by level, output pins by gate id
+            order = self.logicSimulator.order
+            self.assertEqual([gate.level for gate in order],
+                             sorted(gate.level for gate in order))
+            self.assertTrue(all(gate.level > device.level
+                                for gate in order for device in gate.iPins))
+            circuit = self.logicSimulator.circuit
+            gateIds = [circuit.index(oPin.iPins[0])
+                       for oPin in self.logicSimulator.oPins]
+            self.assertEqual(gateIds, sorted(gateIds))
+            expected = self.logicSimulator.getTruthTable()
+            rows = [row.split(" | ") for row in expected.split("\n")[3:]]
+            self.assertEqual(
+                self.logicSimulator.getTruthTable(TruthTableMode.cone),
+                expected)
+            self.assertEqual(
+                self.logicSimulator.getTruthTable(outputs=[0]).split("\n")[3:],
+                [f"{inputs} | {values.split(' ')[0]}"
+                 for inputs, values in rows])
+
+    def testEditSettle(self):
+        # only the new gate and its output pin are re-evaluated
+        self.assertTrue(self.logicSimulator.load(notChainLcf(50)))
+        self.logicSimulator.evaluate()
+        gate = self.logicSimulator.addGate(DeviceType.gateNot, [-1])
+        self.assertEqual(self.logicSimulator.settle(), 2)
+        self.assertEqual(self.logicSimulator.oPins[-1].output, 1)
+        self.logicSimulator.setGateInputs(gate, [50])
+        self.assertEqual(self.logicSimulator.settle(), 1)
+        self.assertEqual(self.logicSimulator.setInputPin(0, 1), 52)
+        self.assertEqual([oPin.output for oPin in self.logicSimulator.oPins],
+                         self.logicSimulator.evaluate())
+
+    def testOptimize(self):
+        # double inverter, duplicated and one-input gates, repeated and
+        # complementary fan-in, dead logic and shared outputs
+        lcf = "3\n11\n" \
+            "3 -1 0\n" \
+            "3 1.1 0\n" \
+            "1 -2 -3 0\n" \
+            "1 -3 -2 -2 0\n" \
+            "2 3.1 0\n" \
+            "2 2.1 5.1 0\n" \
+            "2 4.1 0\n" \
+            "1 -1 1.1 0\n" \
+            "1 -1 -2 0\n" \
+            "3 9.1 0\n" \
+            "1 -3 0\n"
+        self.assertTrue(self.logicSimulator.load(lcf))
+        expected = self.logicSimulator.getTruthTable()
+        self.assertEqual(self.logicSimulator.optimize(), 3)
+        self.assertEqual(self.logicSimulator.getTruthTable(), expected)
+        self.assertEqual(len(self.logicSimulator.oPins), 5)
+        with self.subTest(msg="lcf round trip"):
+            logicSimulator = LogicSimulator()
+            self.assertTrue(logicSimulator.load(
+                self.logicSimulator.netlist.toLcf()))
+            self.assertEqual(logicSimulator.getTruthTable(), expected)
+        for seed in range(8):
+            for compact in [False, True]:
+                with self.subTest(msg=f"seed: {seed}, compact: {compact}"):
+                    logicSimulator = LogicSimulator(compact=compact)
+                    self.assertTrue(logicSimulator.load(randomLcf(6, 60, seed)))
+                    expected = logicSimulator.getTruthTable()
+                    self.assertGreaterEqual(logicSimulator.optimize(), 0)
+                    self.assertEqual(logicSimulator.getTruthTable(), expected)
+        with self.subTest(msg="merged outputs"):
+            self.assertTrue(self.logicSimulator.load(
+                "2\n2\n1 -1 -2 0\n1 -2 -1 0\n"))
+            self.assertEqual(self.logicSimulator.optimize(), 0)
+        # small circuits fold to constant and merged outputs more often
+        for seed in range(100):
+            with self.subTest(msg=f"small, seed: {seed}"):
+                logicSimulator = LogicSimulator()
+                self.assertTrue(logicSimulator.load(randomLcf(3, 8, seed)))
+                expected = logicSimulator.getTruthTable()
+                self.assertGreaterEqual(logicSimulator.optimize(), 0)
+                self.assertTrue(logicSimulator.load(
+                    logicSimulator.netlist.toLcf()))
+                self.assertEqual(logicSimulator.getTruthTable(), expected)
+
     @patch("logicSimulator.LogicSimulator.getHeader", new=lambda _: "i i i | o o o\n"
            "1 2 3 | 1 2 3\n"
            "------+------")
@@ -273,6 +824,646 @@ class TestTextUI(unittest.TestCase):
                              f"Circuit: {len(self.textUI.logicSimulator.iPins)} input pins, "
                              f"{len(self.textUI.logicSimulator.oPins)} output pins and "
                              f"{len(self.textUI.logicSimulator.circuit)} gates\n")
+        with (patch("sys.stdout", new=StringIO()) as stdout,
+              self.subTest(msg="statistics")):
+            self.textUI.processCommand(Command.Display_statistics)
+            self.assertTrue(stdout.getvalue().startswith(
+                "Statistics:\nLogic depth: 3\n"))
+        with (patch("sys.stdout", new=StringIO()) as stdout,
+              self.subTest(msg="truth table")):
+            self.textUI.processCommand(Command.Display_truth_table)
+            self.assertEqual(stdout.getvalue(), "Truth table:\n" +
+                             self.textUI.logicSimulator.getTruthTable() + "\n")
+
+
+    def testProfiling(self):
+        path = str(_PATH.joinpath("file1.lcf"))
+        for profiling in [False, True]:
+            with (patch("sys.stdin", new=StringIO(path + "\n")),
+                  patch("sys.stdout", new=StringIO()) as stdout,
+                  self.subTest(msg=f"profiling: {profiling}")):
+                textUI = TextUI(profiling=profiling)
+                textUI.processCommand(Command.Load_logic_circuit_file)
+                self.assertEqual(textUI.logicSimulator.profiler is not None,
+                                 profiling)
+                textUI.processCommand(Command.Display_statistics)
+                self.assertEqual("Levelized passes" in stdout.getvalue(),
+                                 profiling)
+
+    def testCircuitCache(self):
+        textUI = TextUI(circuitCacheSize=2)
+
+        def command(command: Command, *lines: str) -> str:
+            with (patch("sys.stdin", new=StringIO("\n".join(lines) + "\n")),
+                  patch("sys.stdout", new=StringIO()) as stdout):
+                textUI.processCommand(command)
+            return stdout.getvalue()
+        with TemporaryDirectory() as directory:
+            paths = [Path(directory, f"{n}.lcf") for n in range(3)]
+            for n, path in enumerate(paths):
+                path.write_text(randomLcf(3, 5 + n))
+            command(Command.Load_logic_circuit_file, str(paths[0]))
+            first = textUI.logicSimulator
+            command(Command.Load_logic_circuit_file, str(paths[0]))
+            self.assertIs(textUI.logicSimulator, first)
+            self.assertEqual((textUI.circuitCacheHits,
+                              textUI.circuitCacheMisses), (1, 1))
+            command(Command.Load_logic_circuit_file, str(paths[1]))
+            with self.subTest(msg="switch"):
+                output = command(Command.Switch_circuit, "1")
+                self.assertIn(f"1. {paths[0].resolve()}\n", output)
+                self.assertIn(f"2. {paths[1].resolve()} (current)\n", output)
+                self.assertIs(textUI.logicSimulator, first)
+                self.assertIn("Circuit not found!!",
+                              command(Command.Switch_circuit, "3"))
+            with self.subTest(msg="changed file"):
+                paths[0].write_text(randomLcf(3, 9))
+                command(Command.Load_logic_circuit_file, str(paths[0]))
+                self.assertIsNot(textUI.logicSimulator, first)
+                self.assertEqual(len(textUI.circuits), 2)
+            with self.subTest(msg="eviction"):
+                command(Command.Load_logic_circuit_file, str(paths[2]))
+                self.assertEqual([key[0] for key in textUI.circuits],
+                                 [paths[0].resolve(), paths[2].resolve()])
+
+
+class TestBDD(unittest.TestCase):
+    def testSatisfyingCounts(self):
+        for seed in range(4):
+            with self.subTest(msg=f"seed: {seed}"):
+                logicSimulator = LogicSimulator()
+                self.assertTrue(logicSimulator.load(randomLcf(6, 40, seed)))
+                rows = logicSimulator.getTruthTable().split("\n")[3:]
+                counts = [sum(row.split(" | ")[1].split(" ")[j] == "1"
+                              for row in rows)
+                          for j in range(len(logicSimulator.oPins))]
+                self.assertEqual(logicSimulator.getSatisfyingCounts(), counts)
+
+    def testWidePins(self):
+        # 32 inputs, far beyond exhaustive simulation
+        logicSimulator = LogicSimulator(maxPinCount=32)
+        self.assertTrue(logicSimulator.load(adderLcf(16)))
+        counts = logicSimulator.getSatisfyingCounts()
+        # every sum bit is 1 for half the vectors
+        self.assertEqual(counts[:16], [1 << 31] * 16)
+        # carry out: a + b >= 2^16
+        self.assertEqual(counts[16], (1 << 32) - (1 << 16) * ((1 << 16) + 1) // 2)
+        bdd, outputs = logicSimulator.getBdd()
+        self.assertEqual(len(list(bdd.iterRows(outputs, 5, 9))), 4)
+
+    def testDeepDiagram(self):
+        # 1200 levels, deeper than the recursion limit
+        logicSimulator = LogicSimulator(1200, 1 << 14, compact=True)
+        self.assertTrue(logicSimulator.load(adderLcf(600)))
+        counts = logicSimulator.getSatisfyingCounts()
+        self.assertEqual(counts[0], 1 << 1199)
+        self.assertEqual(counts[600], (1 << 600) * ((1 << 600) - 1) // 2)
+
+    def testEquivalence(self):
+        logicSimulator = LogicSimulator()
+        self.assertTrue(logicSimulator.load(randomLcf(6, 60, 5)))
+        netlist = logicSimulator.netlist
+        bdd = BDD(getVariableOrder(netlist))
+        outputs = bdd.addNetlist(netlist)
+        self.assertEqual(bdd.addNetlist(netlist.optimize()), outputs)
+        f, g = bdd.variable(0), bdd.variable(1)
+        self.assertTrue(bdd.isEquivalent(
+            bdd.negate(bdd.apply(1, f, g)),
+            bdd.apply(2, bdd.negate(f), bdd.negate(g))))
+        self.assertIsNone(bdd.getDifferingRow(f, f))
+        row = bdd.getDifferingRow(bdd.apply(1, f, g), bdd.apply(2, f, g))
+        self.assertNotEqual(bdd.getValue(bdd.apply(1, f, g), row),
+                            bdd.getValue(bdd.apply(2, f, g), row))
+
+
+class TestFaultSimulator(unittest.TestCase):
+    def testTruthTableCoverage(self):
+        logicSimulator = LogicSimulator()
+        self.assertTrue(logicSimulator.load(randomLcf(5, 30, seed=4)))
+        expected = logicSimulator.getTruthTable()
+        faultSimulator = FaultSimulator(logicSimulator, wordSize=8)
+        faultSimulator.simulateTruthTable()
+        # one serial truth table per fault, the gate output forced
+        for gate, value in faultSimulator.faults:
+            with self.subTest(msg=f"gate {gate + 1} stuck-at-{value}"):
+                device = logicSimulator.circuit[gate]
+                device.getOutput = lambda mask=1: setattr(
+                    device, "output", value) or value
+                detected = logicSimulator.getTruthTable() != expected
+                del device.getOutput
+                self.assertEqual((gate, value) in faultSimulator.detected,
+                                 detected)
+        self.assertEqual(logicSimulator.getTruthTable(), expected)
+
+    def testVectors(self):
+        logicSimulator = LogicSimulator()
+        self.assertTrue(logicSimulator.load(adderLcf(2)))
+        faultSimulator = FaultSimulator(logicSimulator)
+        self.assertGreater(faultSimulator.simulate(["0000"]), 0)
+        coverage = faultSimulator.getCoverage()
+        self.assertLess(coverage, 1)
+        # already detected faults are not simulated again
+        self.assertEqual(faultSimulator.simulate(["0000"]), 0)
+        faultSimulator.simulate(["0101", "1010", "1111", "0011", "1100"])
+        self.assertGreater(faultSimulator.getCoverage(), coverage)
+        for fault, vector in faultSimulator.detected.items():
+            self.assertEqual(len(vector), 4)
+        self.assertTrue(faultSimulator.getReport().startswith(
+            f"Fault coverage: {len(faultSimulator.detected)}/"
+            f"{len(faultSimulator.faults)}"))
+
+
+class TestMonteCarloSimulator(unittest.TestCase):
+    def testProbabilities(self):
+        logicSimulator = LogicSimulator(compact=True)
+        self.assertTrue(logicSimulator.load(randomLcf(8, 40, seed=6)))
+        monteCarloSimulator = MonteCarloSimulator(logicSimulator, seed=1,
+                                                  wordSize=1000)
+        monteCarloSimulator.run(1 << 15)
+        monteCarloSimulator.run(1 << 15)
+        self.assertEqual(monteCarloSimulator.vectorCount, 1 << 16)
+        exact = [count / (1 << 8)
+                 for count in logicSimulator.getSatisfyingCounts()]
+        for p, (low, high) in zip(
+                exact, monteCarloSimulator.getConfidenceIntervals(z=5)):
+            self.assertLessEqual(low, p)
+            self.assertLessEqual(p, high)
+
+    def testBias(self):
+        logicSimulator = LogicSimulator(compact=True)
+        self.assertTrue(logicSimulator.load(adderLcf(2)))
+        with self.assertRaises(ValueError):
+            MonteCarloSimulator(logicSimulator, bias=[0.5])
+        monteCarloSimulator = MonteCarloSimulator(logicSimulator)
+        self.assertEqual(monteCarloSimulator.getReport(), "Vectors: 0")
+        with self.assertRaises(ValueError):
+            monteCarloSimulator.getConfidenceIntervals()
+        monteCarloSimulator = MonteCarloSimulator(
+            logicSimulator, bias=[0, 1, 0.25, 1 / 3])
+        monteCarloSimulator.run(1 << 16)
+        ones = monteCarloSimulator.ones
+        self.assertEqual(ones[0], 0)
+        self.assertEqual(ones[1], 1 << 16)
+        self.assertAlmostEqual(ones[2] / (1 << 16), 0.25, delta=0.01)
+        self.assertAlmostEqual(ones[3] / (1 << 16), 1 / 3, delta=0.01)
+
+    def testToggleActivity(self):
+        logicSimulator = LogicSimulator()
+        self.assertTrue(logicSimulator.load(randomLcf(4, 20, seed=2)))
+        monteCarloSimulator = MonteCarloSimulator(logicSimulator, seed=3,
+                                                  wordSize=8)
+        monteCarloSimulator.run(30)
+        # the same vectors one at a time
+        vectors = MonteCarloSimulator(logicSimulator, seed=3, wordSize=8)
+        rows: List[str] = []
+        for start in range(0, 30, 8):
+            size = min(8, 30 - start)
+            words = [vectors.getRandomWord(0.5, size) for _ in range(4)]
+            rows.extend("".join(str(word >> r & 1) for word in words)
+                        for r in range(size))
+        outputs = []
+        for row in rows:
+            for iPin, value in zip(logicSimulator.iPins, row):
+                iPin.output = int(value)
+            logicSimulator.evaluate()
+            outputs.append([device.output
+                            for device in logicSimulator.circuit])
+        for gate, activity in enumerate(
+                monteCarloSimulator.getToggleActivity()):
+            toggles = sum(a[gate] != b[gate]
+                          for a, b in zip(outputs, outputs[1:]))
+            self.assertAlmostEqual(activity, toggles / 29)
+
+
+class TestEquivalenceChecker(unittest.TestCase):
+    def load(self, lcf: str) -> LogicSimulator:
+        logicSimulator = LogicSimulator(compact=True)
+        self.assertTrue(logicSimulator.load(lcf))
+        return logicSimulator
+
+    def testOptimized(self):
+        for lcf in (adderLcf(3), multiplierLcf(3), randomLcf(8, 60, seed=5)):
+            optimized = self.load(lcf)
+            optimized.optimize()
+            equivalenceChecker = EquivalenceChecker(self.load(lcf), optimized)
+            self.assertIsNone(equivalenceChecker.check())
+            self.assertTrue(equivalenceChecker.getReport(None).startswith(
+                "Equivalent"))
+
+    def testCounterexample(self):
+        first = self.load(randomLcf(10, 80, seed=7))
+        # the last gate as OR instead of AND or as AND instead of OR
+        lines = randomLcf(10, 80, seed=7).splitlines()
+        gateType = 3 - int(lines[-1][0]) if lines[-1][0] in "12" else 1
+        lines[-1] = f"{gateType}{lines[-1][1:]}"
+        second = self.load("\n".join(lines))
+        equivalenceChecker = EquivalenceChecker(first, second)
+        exhaustive = equivalenceChecker.checkExhaustive()
+        expected = next(
+            n for n, (a, b) in enumerate(zip(
+                first.getTruthTable().splitlines()[3:],
+                second.getTruthTable().splitlines()[3:]))
+            if a.split("|")[1] != b.split("|")[1])
+        self.assertEqual(exhaustive, format(expected, "010b"))
+        vector = equivalenceChecker.checkRandom(1 << 10)
+        self.assertIsNotNone(vector)
+        firstOutputs, secondOutputs = equivalenceChecker.getOutputs(vector)
+        self.assertNotEqual(firstOutputs, secondOutputs)
+        with self.assertRaises(ValueError):
+            EquivalenceChecker(first, self.load(adderLcf(2)))
+
+
+class TestSimulationServer(unittest.TestCase):
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(2)
+        self.simulationServer = SimulationServer(
+            cacheSize=2, executor=self.executor, chunkRows=8)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def serve(self, client: Callable) -> None:
+        async def main():
+            server = await self.simulationServer.start()
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                try:
+                    await client(port)
+                finally:
+                    await self.simulationServer.close()
+        asyncio.run(main())
+
+    def testProtocol(self):
+        lcf = randomLcf(5, 30, seed=2)
+        expected = LogicSimulator()
+        self.assertTrue(expected.load(lcf))
+        table = expected.getTruthTable().split("\n")
+
+        async def client(port):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            [loaded] = await request(reader, writer, {
+                "id": 1, "command": "load", "lcf": lcf})
+            self.assertEqual(loaded["id"], 1)
+            self.assertEqual(loaded["circuit"], expected.lcfHash)
+            [simulated] = await request(reader, writer, {
+                "command": "simulate", "circuit": loaded["circuit"],
+                "vectors": ["00000", "10110"]})
+            self.assertEqual(simulated["outputs"], [
+                table[3].split(" | ")[1], table[3 + 0b10110].split(" | ")[1]])
+            responses = await request(reader, writer, {
+                "id": 2, "command": "truthTable", "circuit": loaded["circuit"]})
+            self.assertEqual(responses[0]["header"], "\n".join(table[:3]))
+            self.assertTrue(responses[-1]["done"])
+            self.assertEqual(
+                sum((response["rows"] for response in responses[1:-1]), []),
+                table[3:])
+            responses = await request(reader, writer, {
+                "command": "truthTable", "circuit": loaded["circuit"],
+                "outputs": [1]})
+            self.assertEqual(responses[1]["rows"][:8], [
+                row.split(" | ")[0] + " | " + row.split(" | ")[1].split()[1]
+                for row in table[3:11]])
+            for message, error in [
+                    ({"command": "load", "lcf": "1\n1\n4 -1 0\n"}, "line 3"),
+                    ({"command": "simulate", "circuit": "x", "vectors": []},
+                     "not loaded"),
+                    ({"command": "simulate", "circuit": loaded["circuit"],
+                      "vectors": ["012"]}, "input values"),
+                    ({"command": "truthTable", "circuit": loaded["circuit"],
+                      "outputs": [99]}, "output pin"),
+                    ({"command": "nope"}, "unknown command")]:
+                [response] = await request(reader, writer, message)
+                self.assertIn(error, response["error"])
+            writer.write(b"not json\n")
+            self.assertIn("bad request", json.loads(await reader.readline())["error"])
+            writer.close()
+            await writer.wait_closed()
+        self.serve(client)
+
+    def testShutdown(self):
+        # a client still connected when the server stops
+        async def client(port):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            [loaded] = await request(reader, writer, {
+                "command": "load", "lcf": adderLcf(2)})
+            self.assertIn("circuit", loaded)
+        with self.assertNoLogs("asyncio"):
+            self.serve(client)
+        self.assertEqual(self.simulationServer.clients, {})
+
+    def testCacheAndLoad(self):
+        async def client(port):
+            result = await generateLoad(adderLcf(4), port=port, clients=4,
+                                        requests=10, truthTableEvery=5)
+            self.assertEqual(result["requests"], 40)
+            self.assertGreater(result["throughput"], 0)
+            self.assertLessEqual(result["p50"], result["p99"])
+        self.serve(client)
+        self.assertEqual(self.simulationServer.cacheMisses, 1)
+        self.assertEqual(self.simulationServer.cacheHits, 3)
+
+
+class TestBenchmark(unittest.TestCase):
+    def assertArithmetic(self, lcf: str, bits: int,
+                         operation: Callable[[int, int], int]) -> None:
+        logicSimulator = LogicSimulator()
+        self.assertTrue(logicSimulator.load(lcf))
+        for values in logicSimulator.generateInputs(bits << 1):
+            for iPin, v in zip(logicSimulator.iPins, values):
+                iPin.output = v
+            # pins and outputs are least significant bit first
+            a = sum(v << i for i, v in enumerate(values[:bits]))
+            b = sum(v << i for i, v in enumerate(values[bits:]))
+            outputs = logicSimulator.getSimulateOutput()
+            self.assertEqual(sum(v << i for i, v in enumerate(outputs)),
+                             operation(a, b), msg=f"{a}, {b}")
+
+    def testAdder(self):
+        for bits in range(1, 5):
+            with self.subTest(msg=f"{bits} bits"):
+                self.assertArithmetic(adderLcf(bits), bits, add)
+
+    def testMultiplier(self):
+        for bits in range(1, 5):
+            with self.subTest(msg=f"{bits} bits"):
+                self.assertArithmetic(multiplierLcf(bits), bits, mul)
+
+    def testFanoutTree(self):
+        logicSimulator = LogicSimulator()
+        self.assertTrue(logicSimulator.load(fanoutTreeLcf(100)))
+        self.assertEqual(len(logicSimulator.oPins), 1)
+        self.assertEqual(len(logicSimulator.circuit[0].fanouts), 49)
+
+    def testCompareResults(self):
+        baseline = {"results": {"adder/4": {"load": 0.1, "simulate": 0.01,
+                                            "truthTable": None}}}
+        current = {"results": {"adder/4": {"load": 0.3, "simulate": 0.011,
+                                           "truthTable": 1.0}}}
+        self.assertEqual(len(compareResults(baseline, current)), 1)
+        self.assertEqual(compareResults(baseline, baseline), [])
+
+
+class TestBatchUI(unittest.TestCase):
+    def setUp(self) -> None:
+        self.batchUI = BatchUI()
+        self.tempDir = TemporaryDirectory()
+        self.stimulusPath = Path(self.tempDir.name).joinpath("stimulus")
+
+    def tearDown(self) -> None:
+        self.tempDir.cleanup()
+
+    def testTextStimulus(self):
+        with open(self.stimulusPath, "w") as stimulus:
+            stimulus.write("0 1 1\n100\n\n1 1 1\n")
+        output = StringIO()
+        self.assertTrue(self.batchUI.run(
+            _PATH.joinpath("file1.lcf"), self.stimulusPath, output))
+        self.assertEqual(output.getvalue(), "0\n1\n0\n")
+
+    def testBinaryStimulus(self):
+        with open(self.stimulusPath, "wb") as stimulus:
+            stimulus.write(bytes([0b01100000, 0b10000000, 0b11100000]))
+        output = StringIO()
+        self.assertTrue(self.batchUI.run(
+            _PATH.joinpath("file1.lcf"), self.stimulusPath, output, True))
+        self.assertEqual(output.getvalue(), "0\n1\n0\n")
+
+    def testManyVectors(self):
+        logicSimulator = LogicSimulator()
+        self.assertTrue(logicSimulator.load(randomLcf(10, 50)))
+        expected = logicSimulator.getTruthTable().split("\n")[3:]
+        vectors = [format(n, "010b") for n in range(1 << 10)]
+        with self.subTest(msg="partial last batch"):
+            outputs = list(logicSimulator.iterSimulateVectors(vectors, 100))
+            self.assertEqual(outputs, [row[row.find("| ")+2:]
+                                       for row in expected])
+
+    @patch("sys.stderr", new_callable=StringIO)
+    def testInvalidStimulus(self, stderr: StringIO):
+        with open(self.stimulusPath, "w") as stimulus:
+            stimulus.write("0 1 1\n0 2 1\n")
+        self.assertFalse(self.batchUI.run(
+            _PATH.joinpath("file1.lcf"), self.stimulusPath, StringIO()))
+        self.assertIn("line 2", stderr.getvalue())
+
+
+def _simulate(argv: List[str]) -> int:
+    parser = ArgumentParser(prog="main.py simulate",
+                            description="simulate a stimulus file")
+    parser.add_argument("lcf", type=Path)
+    parser.add_argument("stimulus", type=Path)
+    parser.add_argument("-o", "--output", type=Path,
+                        help="output file, stdout by default")
+    parser.add_argument("-b", "--binary", action="store_true",
+                        help="stimulus holds packed binary vectors")
+    parser.add_argument("--max-pins", type=int, default=16)
+    parser.add_argument("--max-gates", type=int, default=1000)
+    args = parser.parse_args(argv)
+    batchUI = BatchUI(args.max_pins, args.max_gates)
+    if args.output is None:
+        return 0 if batchUI.run(args.lcf, args.stimulus, sys.stdout,
+                                args.binary) else 1
+    with open(args.output, "w") as output:
+        return 0 if batchUI.run(args.lcf, args.stimulus, output,
+                                args.binary) else 1
+
+
+def _compile(argv: List[str]) -> int:
+    parser = ArgumentParser(prog="main.py compile",
+                            description="compile an lcf file to .lcfb")
+    parser.add_argument("lcf", type=Path)
+    parser.add_argument("output", type=Path)
+    parser.add_argument("-O", "--optimize", action="store_true",
+                        help="merge duplicated and drop redundant gates")
+    parser.add_argument("--max-pins", type=int, default=16)
+    parser.add_argument("--max-gates", type=int, default=1000)
+    args = parser.parse_args(argv)
+    logicSimulator = LogicSimulator(args.max_pins, args.max_gates, compact=True)
+    if not logicSimulator.loadPath(args.lcf):
+        sys.stderr.write(f"{args.lcf}: {logicSimulator.error}\n")
+        return 1
+    if args.optimize:
+        sys.stderr.write(f"removed {logicSimulator.optimize()} gates\n")
+    logicSimulator.save(args.output)
+    return 0
+
+
+def _table(argv: List[str]) -> int:
+    parser = ArgumentParser(prog="main.py table",
+                            description="write a packed truth table, or print "
+                            "one as text")
+    parser.add_argument("source", type=Path,
+                        help="lcf file, or a .lcft/.npy table to print")
+    parser.add_argument("output", type=Path, nargs="?",
+                        help=".lcft or .npy file to write")
+    parser.add_argument("--pins", type=int,
+                        help="pin count of an .npy table of 3 pins or fewer")
+    parser.add_argument("--max-pins", type=int, default=16)
+    parser.add_argument("--max-gates", type=int, default=1000)
+    args = parser.parse_args(argv)
+    try:
+        if args.source.suffix in (".lcft", ".npy"):
+            with PackedTruthTable(args.source, args.pins) as table:
+                for row in table.iterText():
+                    sys.stdout.write(row + "\n")
+            return 0
+    except (OSError, ValueError) as error:
+        sys.stderr.write(f"{args.source}: {error}\n")
+        return 1
+    if args.output is None:
+        parser.error("output is required for an lcf source")
+    logicSimulator = LogicSimulator(args.max_pins, args.max_gates, compact=True)
+    if not logicSimulator.loadPath(args.source):
+        sys.stderr.write(f"{args.source}: {logicSimulator.error}\n")
+        return 1
+    logicSimulator.savePackedTruthTable(args.output)
+    return 0
+
+
+def _faults(argv: List[str]) -> int:
+    parser = ArgumentParser(prog="main.py faults",
+                            description="stuck-at fault coverage")
+    parser.add_argument("lcf", type=Path)
+    parser.add_argument("stimulus", type=Path, nargs="?",
+                        help="vectors to grade, the full truth table by default")
+    parser.add_argument("--max-pins", type=int, default=16)
+    parser.add_argument("--max-gates", type=int, default=1000)
+    args = parser.parse_args(argv)
+    batchUI = BatchUI(args.max_pins, args.max_gates)
+    if not batchUI.logicSimulator.loadPath(args.lcf):
+        sys.stderr.write(f"{args.lcf}: {batchUI.logicSimulator.error}\n")
+        return 1
+    faultSimulator = FaultSimulator(batchUI.logicSimulator)
+    if args.stimulus is None:
+        faultSimulator.simulateTruthTable()
+    else:
+        with open(args.stimulus, "r") as stimulus:
+            try:
+                faultSimulator.simulate(batchUI.readStimulus(stimulus))
+            except ValueError as error:
+                sys.stderr.write(f"{args.stimulus}: {error}\n")
+                return 1
+    print(faultSimulator.getReport())
+    return 0
+
+
+def _montecarlo(argv: List[str]) -> int:
+    parser = ArgumentParser(prog="main.py montecarlo",
+                            description="output probabilities and toggle "
+                            "activity from random vectors")
+    parser.add_argument("lcf", type=Path)
+    parser.add_argument("-n", "--vectors", type=int, default=1 << 20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--bias", default="0.5",
+                        help="probability of a 1 on every input pin, or a "
+                        "comma separated one per pin")
+    parser.add_argument("--max-pins", type=int, default=1 << 16)
+    parser.add_argument("--max-gates", type=int, default=1 << 20)
+    args = parser.parse_args(argv)
+    if args.vectors < 1:
+        parser.error("--vectors must be at least 1")
+    logicSimulator = LogicSimulator(args.max_pins, args.max_gates, compact=True)
+    if not logicSimulator.loadPath(args.lcf):
+        sys.stderr.write(f"{args.lcf}: {logicSimulator.error}\n")
+        return 1
+    try:
+        bias = [float(p) for p in args.bias.split(",")]
+        if len(bias) == 1:
+            bias *= len(logicSimulator.iPins)
+        monteCarloSimulator = MonteCarloSimulator(
+            logicSimulator, args.seed, bias)
+    except ValueError as error:
+        sys.stderr.write(f"--bias: {error}\n")
+        return 1
+    monteCarloSimulator.run(args.vectors)
+    print(monteCarloSimulator.getReport())
+    return 0
+
+
+def _equiv(argv: List[str]) -> int:
+    parser = ArgumentParser(prog="main.py equiv",
+                            description="check two circuits compute the same "
+                            "outputs")
+    parser.add_argument("first", type=Path)
+    parser.add_argument("second", type=Path)
+    parser.add_argument("-n", "--vectors", type=int, default=1 << 16,
+                        help="random vectors before checking every vector")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-pins", type=int, default=32)
+    parser.add_argument("--max-gates", type=int, default=1 << 20)
+    args = parser.parse_args(argv)
+    circuits = []
+    for path in (args.first, args.second):
+        logicSimulator = LogicSimulator(args.max_pins, args.max_gates,
+                                        compact=True)
+        if not logicSimulator.loadPath(path):
+            sys.stderr.write(f"{path}: {logicSimulator.error}\n")
+            return 1
+        circuits.append(logicSimulator)
+    try:
+        equivalenceChecker = EquivalenceChecker(*circuits, seed=args.seed)
+    except ValueError as error:
+        sys.stderr.write(f"{error}\n")
+        return 1
+    vector = equivalenceChecker.check(args.vectors)
+    print(equivalenceChecker.getReport(vector))
+    return 0 if vector is None else 2
+
+
+def _serve(argv: List[str]) -> int:
+    parser = ArgumentParser(prog="main.py serve",
+                            description="serve simulations as json lines")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", type=Path, help="unix socket path")
+    parser.add_argument("--workers", type=int,
+                        help="truth table processes, every cpu by default")
+    parser.add_argument("--cache-size", type=int, default=64)
+    parser.add_argument("--max-pins", type=int, default=16)
+    parser.add_argument("--max-gates", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    async def serve() -> None:
+        simulationServer = SimulationServer(
+            args.max_pins, args.max_gates, args.cache_size,
+            ProcessPoolExecutor(args.workers))
+        server = await simulationServer.start(args.host, args.port, args.unix)
+        sys.stderr.write(f"serving on {args.unix or f'{args.host}:{args.port}'}\n")
+        async with server:
+            try:
+                await server.serve_forever()
+            finally:
+                await simulationServer.close()
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def _loadgen(argv: List[str]) -> int:
+    parser = ArgumentParser(prog="main.py loadgen",
+                            description="measure a running server")
+    parser.add_argument("lcf", type=Path)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", type=Path, help="unix socket path")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=100,
+                        help="requests per client")
+    parser.add_argument("--vectors", type=int, default=64,
+                        help="vectors per simulate request")
+    parser.add_argument("--truth-table-every", type=int, default=0,
+                        help="send a truth table request every n requests")
+    args = parser.parse_args(argv)
+    result = asyncio.run(generateLoad(
+        args.lcf.read_text(), args.host, args.port, args.unix, args.clients,
+        args.requests, args.vectors, args.truth_table_every))
+    print(f"{result['requests']} requests in {result['seconds']:.3f} s, "
+          f"{result['throughput']:.1f} requests/s, "
+          f"latency p50 {result['p50'] * 1e3:.2f} ms, "
+          f"p99 {result['p99'] * 1e3:.2f} ms")
+    return 0
 
 
 def _test():
@@ -281,11 +1472,36 @@ def _test():
     suite.addTest(loader.loadTestsFromTestCase(TestDeviceOutput))
     suite.addTest(loader.loadTestsFromTestCase(TestLogicSimulator))
     suite.addTest(loader.loadTestsFromTestCase(TestTextUI))
+    suite.addTest(loader.loadTestsFromTestCase(TestBatchUI))
+    suite.addTest(loader.loadTestsFromTestCase(TestBDD))
+    suite.addTest(loader.loadTestsFromTestCase(TestFaultSimulator))
+    suite.addTest(loader.loadTestsFromTestCase(TestMonteCarloSimulator))
+    suite.addTest(loader.loadTestsFromTestCase(TestEquivalenceChecker))
+    suite.addTest(loader.loadTestsFromTestCase(TestSimulationServer))
+    suite.addTest(loader.loadTestsFromTestCase(TestBenchmark))
     unittest.TextTestRunner(verbosity=3).run(suite)
 
 
 if __name__ == "__main__":
     if len(sys.argv) == 2 and sys.argv[1] == "test":
         _test()
+    elif len(sys.argv) > 1 and sys.argv[1] == "simulate":
+        sys.exit(_simulate(sys.argv[2:]))
+    elif len(sys.argv) > 1 and sys.argv[1] == "compile":
+        sys.exit(_compile(sys.argv[2:]))
+    elif len(sys.argv) > 1 and sys.argv[1] == "table":
+        sys.exit(_table(sys.argv[2:]))
+    elif len(sys.argv) > 1 and sys.argv[1] == "faults":
+        sys.exit(_faults(sys.argv[2:]))
+    elif len(sys.argv) > 1 and sys.argv[1] == "montecarlo":
+        sys.exit(_montecarlo(sys.argv[2:]))
+    elif len(sys.argv) > 1 and sys.argv[1] == "equiv":
+        sys.exit(_equiv(sys.argv[2:]))
+    elif len(sys.argv) > 1 and sys.argv[1] == "serve":
+        sys.exit(_serve(sys.argv[2:]))
+    elif len(sys.argv) > 1 and sys.argv[1] == "loadgen":
+        sys.exit(_loadgen(sys.argv[2:]))
+    elif sys.argv[1:] == ["--profile"]:
+        TextUI(profiling=True).displayMenu()
     else:
         TextUI().displayMenu()
@@ -0,0 +1,112 @@
+from math import sqrt
+from random import Random
+from typing import List, Optional, Sequence, Tuple
+
+from logicSimulator import LogicSimulator
+
+
+class MonteCarloSimulator:
+    # random input vectors simulated bit-parallel on the netlist, wordSize
+    # vectors per batch, for circuits too wide for a truth table; counts
+    # accumulate over every run
+
+    def __init__(self, logicSimulator: LogicSimulator, seed: int = 0,
+                 bias: Optional[Sequence[float]] = None,
+                 wordSize: int = 1 << 14) -> None:
+        assert logicSimulator.netlist is not None
+        self.netlist = logicSimulator.netlist
+        pinCount = self.netlist.pinCount
+        # probability of a 1 on every input pin
+        self.bias = [0.5] * pinCount if bias is None else list(bias)
+        if len(self.bias) != pinCount or \
+                not all(0 <= p <= 1 for p in self.bias):
+            raise ValueError(f"expected {pinCount} input probabilities 0-1")
+        self.random = Random(seed)
+        self.wordSize = wordSize
+        self.vectorCount = 0
+        signalCount = pinCount + len(self.netlist.gateTypes)
+        # vectors with a 1, and changes between consecutive vectors, per
+        # signal
+        self.ones = [0] * signalCount
+        self.toggles = [0] * signalCount
+        self.lastValues = [0] * signalCount
+
+    def getRandomWord(self, p: float, size: int) -> int:
+        # size bits, each 1 with probability p to 16 binary digits: from the
+        # least significant digit of p up, a 1 digit ors and a 0 digit ands
+        # a fresh uniform word
+        digits = round(p * (1 << 16))
+        if digits == 0 or digits == 1 << 16:
+            return 0 if digits == 0 else (1 << size) - 1
+        bit = (digits & -digits).bit_length() - 1
+        word = self.random.getrandbits(size)
+        for bit in range(bit + 1, 16):
+            if digits >> bit & 1:
+                word |= self.random.getrandbits(size)
+            else:
+                word &= self.random.getrandbits(size)
+        return word
+
+    def run(self, vectorCount: int) -> None:
+        values = [0] * len(self.ones)
+        for start in range(0, vectorCount, self.wordSize):
+            size = min(self.wordSize, vectorCount - start)
+            mask = (1 << size) - 1
+            for i, p in enumerate(self.bias):
+                values[i] = self.getRandomWord(p, size)
+            self.netlist.evaluate(values, mask)
+            for i, word in enumerate(values):
+                self.ones[i] += word.bit_count()
+                # bit r against bit r - 1, bit 0 against the last batch
+                self.toggles[i] += ((word ^ (word << 1 | self.lastValues[i]))
+                                    & mask).bit_count()
+                self.lastValues[i] = word >> (size - 1)
+            if self.vectorCount == 0:
+                # the first vector has no predecessor
+                for i, word in enumerate(values):
+                    self.toggles[i] -= word & 1
+            self.vectorCount += size
+
+    def getSignalProbabilities(self) -> List[float]:
+        # fraction of the vectors setting each output pin to 1
+        if self.vectorCount == 0:
+            raise ValueError("no vectors simulated")
+        return [self.ones[i] / self.vectorCount for i in self.netlist.outputs]
+
+    def getConfidenceIntervals(self, z: float = 1.96
+                               ) -> List[Tuple[float, float]]:
+        # wilson score interval of every output probability, 95% by default
+        probabilities = self.getSignalProbabilities()
+        n = self.vectorCount
+        intervals = []
+        for p in probabilities:
+            center = (p + z * z / (2 * n)) / (1 + z * z / n)
+            half = z * sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / \
+                (1 + z * z / n)
+            intervals.append((max(0.0, center - half), min(1.0, center + half)))
+        return intervals
+
+    def getToggleActivity(self) -> List[float]:
+        # changes per vector of every gate output, in gate id order
+        pinCount = self.netlist.pinCount
+        activity = [0.0] * len(self.netlist.gateTypes)
+        if self.vectorCount > 1:
+            for position, gateId in enumerate(self.netlist.gateIds):
+                activity[gateId] = self.toggles[pinCount + position] / \
+                    (self.vectorCount - 1)
+        return activity
+
+    def getReport(self, top: int = 5) -> str:
+        if self.vectorCount == 0:
+            return "Vectors: 0"
+        lines = [f"Vectors: {self.vectorCount}", "Output probabilities:"]
+        for j, (p, (low, high)) in enumerate(zip(
+                self.getSignalProbabilities(), self.getConfidenceIntervals())):
+            lines.append(f"  {j + 1}: {p:.4f} [{low:.4f}, {high:.4f}]")
+        activity = self.getToggleActivity()
+        busiest = sorted(range(len(activity)), key=lambda i: -activity[i])[:top]
+        lines.append(f"Mean toggle activity: "
+                     f"{sum(activity) / max(1, len(activity)):.4f}")
+        lines.append("Most active gates: " + ", ".join(
+            f"{i + 1} ({activity[i]:.4f})" for i in busiest))
+        return "\n".join(lines)
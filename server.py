@@ -0,0 +1,276 @@
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from hashlib import sha256
+import json
+from pathlib import Path
+from random import Random
+from statistics import median
+from threading import local
+from time import perf_counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from logicSimulator import LogicSimulator, Netlist
+
+
+# recently used circuits of an executor thread by lcf hash
+_executorCircuits = local()
+
+
+def _truthTableRows(lcfHash: str, netlist: Netlist, start: int, stop: int,
+                    outputs: Optional[Sequence[int]]) -> List[str]:
+    # truth table rows start to stop, runs in the executor
+    circuits: OrderedDict[str, LogicSimulator] = getattr(
+        _executorCircuits, "circuits", OrderedDict())
+    _executorCircuits.circuits = circuits
+    logicSimulator = circuits.get(lcfHash)
+    if logicSimulator is None:
+        logicSimulator = circuits[lcfHash] = LogicSimulator(compact=True)
+        logicSimulator.build(netlist)
+        logicSimulator.lcfHash = lcfHash
+        if len(circuits) > 16:
+            circuits.popitem(last=False)
+    circuits.move_to_end(lcfHash)
+    if outputs is not None:
+        return list(logicSimulator.iterConeRows(outputs))
+    return list(logicSimulator.iterBitParallelRows(
+        min(1 << 12, stop - start), start, stop))
+
+
+class SimulationServer:
+    # line-delimited json over tcp or a unix socket, every request is an
+    # object with a "command" and an optional "id" echoed in the responses:
+    #   {"command": "load", "lcf": text} -> {"circuit": lcf hash, "inputs",
+    #       "outputs", "gates"}
+    #   {"command": "simulate", "circuit", "vectors": ["011", ...]} ->
+    #       {"outputs": ["0 1", ...]}
+    #   {"command": "truthTable", "circuit", "outputs": [0, ...] optional} ->
+    #       {"header"}, then {"rows": [...]} chunks, then {"done": true}
+    # failed requests get {"error": message}
+
+    def __init__(self, maxPinCount: int = 16, maxGateCount: int = 1000,
+                 cacheSize: int = 64, executor: Optional[Executor] = None,
+                 chunkRows: int = 1 << 12) -> None:
+        self.maxPinCount = maxPinCount
+        self.maxGateCount = maxGateCount
+        # loaded circuits by lcf hash, least recently used first
+        self.circuits: OrderedDict[str, LogicSimulator] = OrderedDict()
+        self.cacheSize = cacheSize
+        self.cacheHits = 0
+        self.cacheMisses = 0
+        # truth tables are simulated here, processes for every cpu by default
+        self.executor = executor
+        # truth table rows per job and per response line, a power of 2
+        self.chunkRows = chunkRows
+        self.requestCount = 0
+        self.server: Optional[asyncio.AbstractServer] = None
+        # connection of every running client handler, see close
+        self.clients: Dict[asyncio.Task, asyncio.StreamWriter] = {}
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0,
+                    path: Optional[Path] = None) -> asyncio.AbstractServer:
+        # serves on the unix socket path if given, else on host:port
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor()
+        if path is not None:
+            self.server = await asyncio.start_unix_server(
+                self.handleClient, path, limit=1 << 24)
+        else:
+            self.server = await asyncio.start_server(
+                self.handleClient, host, port, limit=1 << 24)
+        return self.server
+
+    async def close(self) -> None:
+        # stops accepting and ends every client connection, handlers then
+        # return at the end of their stream instead of being cancelled
+        if self.server is not None:
+            self.server.close()
+        for writer in self.clients.values():
+            writer.close()
+        await asyncio.gather(*self.clients, return_exceptions=True)
+
+    async def handleClient(self, reader: asyncio.StreamReader,
+                           writer: asyncio.StreamWriter) -> None:
+        # requests of one client are answered in order
+        task = asyncio.current_task()
+        assert task is not None
+        self.clients[task] = writer
+        try:
+            while line := await reader.readline():
+                self.requestCount += 1
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("request must be an object")
+                except ValueError as error:
+                    await self.send(writer, {"error": f"bad request: {error}"})
+                    continue
+                response = {"id": request["id"]} if "id" in request else {}
+                try:
+                    command = request.get("command")
+                    if command == "load":
+                        response.update(self.load(request))
+                    elif command == "simulate":
+                        response.update(self.simulate(request))
+                    elif command == "truthTable":
+                        await self.streamTruthTable(request, response, writer)
+                        continue
+                    else:
+                        raise ValueError(f"unknown command {command!r}")
+                except (KeyError, TypeError, ValueError) as error:
+                    response["error"] = str(error)
+                await self.send(writer, response)
+        except (ConnectionError, ValueError):
+            pass  # disconnected or a line over the stream limit
+        finally:
+            del self.clients[task]
+            writer.close()
+
+    async def send(self, writer: asyncio.StreamWriter, response: Dict) -> None:
+        writer.write(json.dumps(response).encode() + b"\n")
+        await writer.drain()
+
+    def getCircuit(self, request: Dict) -> LogicSimulator:
+        lcfHash = request["circuit"]
+        logicSimulator = self.circuits.get(lcfHash)
+        if logicSimulator is None:
+            raise ValueError(f"circuit {lcfHash} is not loaded")
+        self.circuits.move_to_end(lcfHash)
+        return logicSimulator
+
+    def load(self, request: Dict) -> Dict:
+        lcf = request["lcf"]
+        if not isinstance(lcf, str):
+            raise TypeError("lcf must be a string")
+        lcfHash = sha256(lcf.encode()).hexdigest()
+        logicSimulator = self.circuits.get(lcfHash)
+        if logicSimulator is not None:
+            self.cacheHits += 1
+            self.circuits.move_to_end(lcfHash)
+        else:
+            self.cacheMisses += 1
+            logicSimulator = LogicSimulator(
+                self.maxPinCount, self.maxGateCount, compact=True)
+            if not logicSimulator.load(lcf):
+                raise ValueError(str(logicSimulator.error))
+            self.circuits[lcfHash] = logicSimulator
+            if len(self.circuits) > self.cacheSize:
+                self.circuits.popitem(last=False)
+        return {"circuit": lcfHash, "inputs": len(logicSimulator.iPins),
+                "outputs": len(logicSimulator.oPins),
+                "gates": len(logicSimulator.circuit)}
+
+    def simulate(self, request: Dict) -> Dict:
+        # bit-parallel on the event loop, vectors are validated first as the
+        # simulator is shared by every client
+        logicSimulator = self.getCircuit(request)
+        pinCount = len(logicSimulator.iPins)
+        vectors = request["vectors"]
+        if not isinstance(vectors, list):
+            raise TypeError("vectors must be a list")
+        for vector in vectors:
+            if not isinstance(vector, str) or len(vector) != pinCount or \
+                    vector.strip("01"):
+                raise ValueError(f"expected {pinCount} input values 0/1")
+        return {"outputs": list(logicSimulator.iterSimulateVectors(vectors))}
+
+    async def streamTruthTable(self, request: Dict, response: Dict,
+                               writer: asyncio.StreamWriter) -> None:
+        # row ranges are simulated in the executor a few jobs ahead of the
+        # rows being sent, so slow clients do not hold simulated tables
+        logicSimulator = self.getCircuit(request)
+        outputs = request.get("outputs")
+        if outputs is not None and (
+                not isinstance(outputs, list) or not all(
+                    isinstance(j, int) and 0 <= j < len(logicSimulator.oPins)
+                    for j in outputs)):
+            raise ValueError("outputs must be a list of output pin indices")
+        loop = asyncio.get_running_loop()
+        rowCount = 1 << len(logicSimulator.iPins)
+        ranges: List[Tuple[int, int]] = [(0, rowCount)] if outputs is not None \
+            else [(start, min(start + self.chunkRows, rowCount))
+                  for start in range(0, rowCount, self.chunkRows)]
+        jobs: List[asyncio.Future] = []
+        await self.send(writer, {**response,
+                                 "header": logicSimulator.getHeader(outputs)})
+        for start, stop in ranges:
+            jobs.append(loop.run_in_executor(
+                self.executor, _truthTableRows, logicSimulator.lcfHash,
+                logicSimulator.netlist, start, stop, outputs))
+            if len(jobs) > 4:
+                await self.sendRows(writer, response, await jobs.pop(0))
+        for job in jobs:
+            await self.sendRows(writer, response, await job)
+        await self.send(writer, {**response, "done": True})
+
+    async def sendRows(self, writer: asyncio.StreamWriter, response: Dict,
+                       rows: List[str]) -> None:
+        for start in range(0, len(rows), self.chunkRows):
+            await self.send(writer, {
+                **response, "rows": rows[start:start + self.chunkRows]})
+
+
+async def request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                  message: Dict) -> List[Dict]:
+    # sends one request, returns every response line it produced
+    writer.write(json.dumps(message).encode() + b"\n")
+    await writer.drain()
+    responses = []
+    while True:
+        response = json.loads(await reader.readline())
+        responses.append(response)
+        if message.get("command") != "truthTable" or "error" in response or \
+                response.get("done"):
+            return responses
+
+
+async def generateLoad(lcf: str, host: str = "127.0.0.1", port: int = 0,
+                       path: Optional[Path] = None, clients: int = 16,
+                       requests: int = 100, vectors: int = 64,
+                       truthTableEvery: int = 0) -> Dict[str, float]:
+    # clients load lcf, then send simulate requests of random vectors (and a
+    # truth table request every truthTableEvery requests), returns the
+    # throughput and latency percentiles in seconds
+    latencies: List[float] = []
+
+    async def client(seed: int) -> None:
+        rng = Random(seed)
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(
+                path, limit=1 << 24)
+        else:
+            reader, writer = await asyncio.open_connection(
+                host, port, limit=1 << 24)
+        try:
+            [loaded] = await request(reader, writer, {
+                "command": "load", "lcf": lcf})
+            if "error" in loaded:
+                raise ValueError(loaded["error"])
+            pinCount = loaded["inputs"]
+            for n in range(requests):
+                if truthTableEvery and n % truthTableEvery == 0:
+                    message = {"id": n, "command": "truthTable",
+                               "circuit": loaded["circuit"]}
+                else:
+                    message = {"id": n, "command": "simulate",
+                               "circuit": loaded["circuit"], "vectors": [
+                                   format(rng.getrandbits(pinCount),
+                                          f"0{pinCount}b")
+                                   for _ in range(vectors)]}
+                start = perf_counter()
+                responses = await request(reader, writer, message)
+                latencies.append(perf_counter() - start)
+                if "error" in responses[-1]:
+                    raise ValueError(responses[-1]["error"])
+        finally:
+            writer.close()
+            await writer.wait_closed()
+    start = perf_counter()
+    await asyncio.gather(*(client(seed) for seed in range(clients)))
+    seconds = perf_counter() - start
+    latencies.sort()
+    return {"requests": len(latencies), "seconds": seconds,
+            "throughput": len(latencies) / seconds,
+            "p50": median(latencies),
+            "p99": latencies[min(len(latencies) - 1,
+                                 len(latencies) * 99 // 100)]}
@@ -1,9 +1,10 @@
+from collections import OrderedDict
 from enum import Enum
 from pathlib import Path
 import sys
-from typing import Optional
+from typing import BinaryIO, Iterator, List, Optional, TextIO, Tuple
 
-from logicSimulator import LogicSimulator
+from logicSimulator import LogicSimulator, TruthTableMode
 
 
 class Command(Enum):
@@ -11,17 +12,34 @@ class Command(Enum):
     Simulation = 2
     Display_truth_table = 3
     Exit = 4
+    Display_statistics = 5
+    Switch_circuit = 6
 
 
 class TextUI:
 
-    def __init__(self) -> None:
+    def __init__(self, truthTableCacheDir: Optional[Path] = None,
+                 circuitCacheSize: int = 8, profiling: bool = False) -> None:
         self.MENU = "1. Load logic circuit file\n"\
                     "2. Simulation\n"\
                     "3. Display truth table\n"\
                     "4. Exit\n"\
+                    "5. Display statistics\n"\
+                    "6. Switch circuit\n"\
                     "Command:"
         self.logicSimulator: Optional[LogicSimulator] = None
+        # loaded circuits by (resolved path, mtime, size), least recently
+        # used first, an unchanged file is not parsed again
+        self.circuits: OrderedDict[Tuple[Path, int, int], LogicSimulator] = \
+            OrderedDict()
+        self.circuitCacheSize = circuitCacheSize
+        self.circuitCacheHits = 0
+        self.circuitCacheMisses = 0
+        # saves truth tables by lcf hash when set
+        self.truthTableCacheDir = truthTableCacheDir
+        # gate evaluation counts and phase times in the statistics, slows
+        # simulation down so only when asked for
+        self.profiling = profiling
         self.exit = False
 
     def displayMenu(self) -> None:
@@ -44,17 +62,33 @@ class TextUI:
             if not filePath.exists():
                 sys.stdout.write("File not found or file format error!!\n")
                 return
-            with open(filePath, "r") as lcf:
-                logicSimulator = LogicSimulator()
+            filePath = filePath.resolve()
+            stat = filePath.stat()
+            key = (filePath, stat.st_mtime_ns, stat.st_size)
+            logicSimulator = self.circuits.get(key)
+            if logicSimulator is not None:
+                self.circuitCacheHits += 1
+                self.circuits.move_to_end(key)
+            else:
+                self.circuitCacheMisses += 1
+                logicSimulator = LogicSimulator(
+                    truthTableCacheDir=self.truthTableCacheDir)
+                if self.profiling:
+                    logicSimulator.enableProfiling()
                 # verify lcf
-                if not logicSimulator.load(lcf.read()):
-                    sys.stdout.write("File not found or file format error!!\n")
+                if not logicSimulator.loadPath(filePath):
+                    sys.stdout.write("File not found or file format error!!\n"
+                                     f"{logicSimulator.error}\n")
                     return
-                self.logicSimulator = logicSimulator
-                sys.stdout.write(
-                    f"Circuit: {len(self.logicSimulator.iPins)} input pins, "
-                    f"{len(self.logicSimulator.oPins)} output pins and "
-                    f"{len(self.logicSimulator.circuit)} gates\n")
+                # older versions of the file are stale
+                for stale in [cached for cached in self.circuits
+                              if cached[0] == filePath]:
+                    del self.circuits[stale]
+                self.circuits[key] = logicSimulator
+                if len(self.circuits) > self.circuitCacheSize:
+                    self.circuits.popitem(last=False)
+            self.logicSimulator = logicSimulator
+            sys.stdout.write(self.getCircuitSummary(logicSimulator) + "\n")
             return
         if command == Command.Simulation:
             if not self.logicSimulator:
@@ -78,10 +112,107 @@ class TextUI:
                 sys.stdout.write(
                     "Please load an lcf file, before using this operation.\n")
                 return
-            sys.stdout.write("Truth table:\n" +
-                             self.logicSimulator.getTruthTable() + "\n")
+            sys.stdout.write("Truth table:\n")
+            self.logicSimulator.writeTruthTable(
+                sys.stdout, TruthTableMode.bitParallel)
+            sys.stdout.write("\n")
+            return
+        if command == Command.Display_statistics:
+            if not self.logicSimulator:
+                sys.stdout.write(
+                    "Please load an lcf file, before using this operation.\n")
+                return
+            sys.stdout.write("Statistics:\n" +
+                             self.logicSimulator.getStatisticsReport() + "\n")
+            return
+        if command == Command.Switch_circuit:
+            if not self.circuits:
+                sys.stdout.write(
+                    "Please load an lcf file, before using this operation.\n")
+                return
+            keys = list(self.circuits)
+            sys.stdout.write("Loaded circuits:\n")
+            for n, key in enumerate(keys, 1):
+                current = " (current)" \
+                    if self.circuits[key] is self.logicSimulator else ""
+                sys.stdout.write(f"{n}. {key[0]}{current}\n")
+            sys.stdout.write("Please key in a circuit number: ")
+            number = int(sys.stdin.readline().rstrip())
+            if not 0 < number <= len(keys):
+                sys.stdout.write("Circuit not found!!\n")
+                return
+            self.circuits.move_to_end(keys[number - 1])
+            self.logicSimulator = self.circuits[keys[number - 1]]
+            sys.stdout.write(
+                self.getCircuitSummary(self.logicSimulator) + "\n")
             return
 
+    def getCircuitSummary(self, logicSimulator: LogicSimulator) -> str:
+        return f"Circuit: {len(logicSimulator.iPins)} input pins, " \
+            f"{len(logicSimulator.oPins)} output pins and " \
+            f"{len(logicSimulator.circuit)} gates"
+
+
+class BatchUI:
+    # simulates a stimulus file without prompts, one input vector per line
+    # ("0 1 1" or "011") or packed binary vectors with pin 1 as the most
+    # significant bit of each ceil(pins / 8) byte record
+
+    def __init__(self, maxPinCount: int = 16, maxGateCount: int = 1000) -> None:
+        self.logicSimulator = LogicSimulator(
+            maxPinCount, maxGateCount, compact=True)
+
+    def run(self, lcfPath: Path, stimulusPath: Path, output: TextIO,
+            binary: bool = False, chunkRows: int = 1 << 10) -> bool:
+        if not lcfPath.exists() or not stimulusPath.exists():
+            sys.stderr.write("File not found!!\n")
+            return False
+        if not self.logicSimulator.loadPath(lcfPath):
+            sys.stderr.write(f"{lcfPath}: {self.logicSimulator.error}\n")
+            return False
+        with open(stimulusPath, "rb" if binary else "r") as stimulus:
+            vectors = self.readBinaryStimulus(stimulus) if binary \
+                else self.readStimulus(stimulus)
+            chunk: List[str] = []
+            try:
+                for row in self.logicSimulator.iterSimulateVectors(vectors):
+                    chunk.append(row)
+                    if len(chunk) >= chunkRows:
+                        output.write("\n".join(chunk) + "\n")
+                        chunk = []
+            except ValueError as error:
+                sys.stderr.write(f"{stimulusPath}: {error}\n")
+                return False
+            finally:
+                if chunk:
+                    output.write("\n".join(chunk) + "\n")
+        return True
+
+    def readStimulus(self, stimulus: TextIO) -> Iterator[str]:
+        pinCount = len(self.logicSimulator.iPins)
+        for lineNo, line in enumerate(stimulus, 1):
+            vector = line.rstrip("\n").replace(" ", "")
+            if not vector:
+                continue
+            if len(vector) != pinCount or vector.strip("01"):
+                raise ValueError(
+                    f"line {lineNo}: expected {pinCount} input values 0/1")
+            yield vector
+
+    def readBinaryStimulus(self, stimulus: BinaryIO,
+                           bufferRecords: int = 1 << 12) -> Iterator[str]:
+        pinCount = len(self.logicSimulator.iPins)
+        recordSize = (pinCount + 7) >> 3
+        while True:
+            buffer = stimulus.read(recordSize * bufferRecords)
+            if len(buffer) % recordSize:
+                raise ValueError("truncated input vector at end of file")
+            for i in range(0, len(buffer), recordSize):
+                record = int.from_bytes(buffer[i:i + recordSize], "big")
+                yield format(record, f"0{recordSize << 3}b")[:pinCount]
+            if len(buffer) < recordSize * bufferRecords:
+                return
+
 
 if __name__ == "__main__":
     TextUI().displayMenu()